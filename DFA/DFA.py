@@ -1,10 +1,9 @@
 import json
 import os
-import networkx as nx
-import matplotlib.pyplot as plt
-import random
 from collections import defaultdict
-from graphviz import Source
+import product
+
+# NumPy (batch), the samplers and the drawing backends are imported on first use, importing the core only loads the standard library
 
 class DFA:
     '''
@@ -17,12 +16,46 @@ class DFA:
     - initial_state (str): The initial state of the DFA.
     - accept_states (list): List of accepting states in the DFA.
     - transitions (dict): Dictionary representing the transitions between states based on input symbols.
+    - state_index (dict): Mapping from each state to its dense integer id.
+    - state_names (list): List of states indexed by their integer id.
+    - symbol_index (dict): Mapping from each alphabet symbol to its dense integer id.
+    - symbols (list): List of alphabet symbols indexed by their integer id.
+    - char_alphabet (bool): True if every symbol is a single character, so that input strings can be plain str.
+    - initial_id (int): The integer id of the initial state.
+    - dead_state (int): The integer id of the dead state sentinel, reached by every undefined transition.
+    - table (list): Flat transition table, the next state of (state, symbol) is at table[state * len(symbols) + symbol].
+    - accept_bitmap (bytearray): 1 at the position of every accepting state id, 0 otherwise.
+    - live_bitmap (bytearray): 1 at the position of every state from which an accepting state can be reached, 0 otherwise.
+    - unknown_code (int): Symbol id used by encode_batch for characters outside the alphabet.
+    - pad_code (int): Symbol id used by encode_batch to pad shorter strings, it leaves every state unchanged.
 
     Methods:
-    - run(input_string: str) -> bool: Processes an input string and returns True if the string is accepted, False otherwise.
-    - generate_random_tests(n_trials=10, min_k=1, max_k=5) -> list: Generates random input strings and tests them against the DFA.
+    - from_dict(json_data: dict, file_path=None) -> DFA: Constructs a DFA from an already loaded JSON definition.
+    - from_regex(pattern: str, alphabet: list = None) -> DFA: Constructs a DFA from a regular expression.
+    - to_dict() -> dict: Returns the JSON definition of the DFA.
+    - save(file_path: str): Writes the JSON definition of the DFA to a file.
+    - compile(): Interns states and symbols to dense integers and builds the flat transition table.
+    - run(input_string) -> bool: Processes an input string (or sequence of symbols) and returns True if the string is accepted, False otherwise.
+    - profile() -> Profile: Enables the instrumented run and returns its counters.
+    - unprofile() -> Profile: Disables the instrumented run and returns its counters.
+    - generate_random_tests(n_trials=10, min_k=1, max_k=5, accepted=None) -> list: Generates random input strings and tests them against the DFA.
+    - sampler(accepted=True) -> Sampler: Returns the object counting and uniformly sampling the accepted (or rejected) strings.
     - bulk_run(input_strings: list) -> list: Processes a list of input strings and returns a list of results.
-    - draw(file_path=None): Draws a diagram of the DFA using NetworkX and Matplotlib. Optionally saves the diagram to a file.
+    - join(symbols: list): Builds an input string from a list of symbols.
+    - tokenize(text: str, delimiter=",", separator="\\n") -> tuple: Splits a delimited text into records of symbols and encodes them.
+    - bulk_run_tokens(text: str, delimiter=",", separator="\\n") -> np.ndarray: Runs every record of a delimited text and returns a boolean accept array.
+    - encode_batch(input_strings: list) -> tuple: Encodes a batch of input strings into a padded symbol id matrix and a length vector.
+    - encode_sequences(sequences: list) -> tuple: Encodes a batch of symbol sequences into a padded symbol id matrix and a length vector.
+    - run_encoded(codes: np.ndarray, lengths: np.ndarray = None) -> np.ndarray: Runs an already encoded batch and returns a boolean accept array.
+    - bulk_run_batch(input_strings: list) -> np.ndarray: Processes a batch of input strings in lockstep with NumPy and returns a boolean accept array.
+    - minimize() -> DFA: Returns the equivalent complete DFA with the minimum number of states.
+    - intersection(*others) -> ProductDFA: Returns the lazy product accepting the strings accepted by this DFA and all the others.
+    - union(*others) -> ProductDFA: Returns the lazy product accepting the strings accepted by this DFA or any of the others.
+    - difference(other) -> ProductDFA: Returns the lazy product accepting the strings accepted by this DFA and rejected by the other.
+    - complement() -> ProductDFA: Returns the lazy automaton accepting the strings over the alphabet rejected by this DFA.
+    - is_subset(other) -> tuple: Checks whether the other DFA accepts every string this DFA accepts, with a shortest counterexample.
+    - equivalent(other) -> tuple: Checks whether the two DFAs accept the same strings, with a shortest counterexample.
+    - draw(file_name=None, format="png", around=None, hops=1, input_string=None, heat=None): Draws a diagram of the DFA, or of the neighborhood of a state or an input path, as PNG, SVG or DOT, optionally with a profiling heatmap. Optionally saves the diagram to a file.
     '''
     def __init__(self, file_path):
         '''
@@ -33,6 +66,66 @@ class DFA:
         '''
         self.file_path = file_path
         self.states, self.alphabet, self.initial_state, self.accept_states, self.transitions = self._parse_fsm(self._read_json_file())
+        self.compile()
+
+    @classmethod
+    def from_dict(cls, json_data: dict, file_path=None) -> "DFA":
+        '''
+        Constructs a new DFA object from an already loaded JSON definition.
+        
+        Args:
+        - json_data (dict): A dictionary containing the DFA definition, in the same schema as the JSON files.
+        - file_path (str): The path the definition was read from, if any.
+        
+        Returns:
+        - DFA: The new DFA.
+        '''
+        dfa = cls.__new__(cls)
+        dfa.file_path = file_path
+        dfa.states, dfa.alphabet, dfa.initial_state, dfa.accept_states, dfa.transitions = dfa._parse_fsm(json_data)
+        dfa.compile()
+        return dfa
+
+    @classmethod
+    def from_regex(cls, pattern: str, alphabet: list = None) -> "DFA":
+        '''
+        Constructs a new DFA accepting exactly the strings matched (as a whole) by a regular expression.
+        The DFA is built eagerly by subset construction, see nfa.NFA for the supported syntax and for the lazy alternative.
+        
+        Args:
+        - pattern (str): The regular expression.
+        - alphabet (list): The single-character symbols of the DFA. If None, the characters of the pattern.
+        
+        Returns:
+        - DFA: The new DFA.
+        '''
+        from nfa import NFA
+        return NFA.from_regex(pattern, alphabet).to_dfa()
+
+    def to_dict(self) -> dict:
+        '''
+        Returns the definition of the DFA in the same schema as the JSON files.
+        
+        Returns:
+        - dict: A dictionary containing the DFA definition.
+        '''
+        return {
+            "states": list(self.states),
+            "alphabet": list(self.alphabet),
+            "transitions": [{"from": from_state, "to": to_state, "input": input_symbol} for (from_state, input_symbol), to_state in self.transitions.items()],
+            "initialState": self.initial_state,
+            "acceptStates": list(self.accept_states),
+        }
+
+    def save(self, file_path: str):
+        '''
+        Writes the definition of the DFA to a JSON file.
+        
+        Args:
+        - file_path (str): The path of the JSON file.
+        '''
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
 
     def _parse_fsm(self, json_data: dict) -> tuple:
         '''
@@ -82,29 +175,144 @@ class DFA:
                 raise ValueError("Error: file not valid, ensure it is a valid JSON file")
         return dfa_json
 
-    def run(self, input_string: str) -> bool:
+    def compile(self):
+        '''
+        Interns states and symbols to dense integers and builds a flat transition table.
+        The table has one extra row for the dead state, every undefined transition (and the dead state itself) leads there.
+        Must be called again if states, alphabet, accept states or transitions are modified after construction.
+        '''
+        state_index = {}
+        for state in [*self.states, self.initial_state, *self.accept_states, *(k[0] for k in self.transitions), *self.transitions.values()]:
+            state_index.setdefault(state, len(state_index))
+        symbol_index = {}
+        for symbol in self.alphabet:
+            symbol_index.setdefault(symbol, len(symbol_index))
+
+        width = len(symbol_index)
+        dead_state = len(state_index)
+        table = [dead_state] * ((dead_state + 1) * width)
+        for (from_state, input_symbol), to_state in self.transitions.items():
+            # transitions on symbols outside the alphabet can never be taken, run rejects the symbol first
+            if input_symbol in symbol_index:
+                table[state_index[from_state] * width + symbol_index[input_symbol]] = state_index[to_state]
+
+        accept_bitmap = bytearray(dead_state + 1)
+        for state in self.accept_states:
+            accept_bitmap[state_index[state]] = 1
+
+        # states that can still reach an accepting state, found backwards from the accepting ones
+        predecessors = [[] for _ in range(dead_state + 1)]
+        for i, to_state in enumerate(table):
+            predecessors[to_state].append(i // width)
+        live_bitmap = bytearray(accept_bitmap)
+        stack = [state for state in range(dead_state) if accept_bitmap[state]]
+        while stack:
+            for from_state in predecessors[stack.pop()]:
+                if not live_bitmap[from_state]:
+                    live_bitmap[from_state] = 1
+                    stack.append(from_state)
+
+        self._set_tables(list(state_index), list(symbol_index), state_index[self.initial_state], table, accept_bitmap, live_bitmap, state_index, symbol_index)
+
+    def _set_tables(self, state_names: list, symbols: list, initial_id: int, table, accept_bitmap, live_bitmap, state_index: dict = None, symbol_index: dict = None):
+        '''
+        Installs compiled tables, built by compile or loaded from a compiled file.
+        
+        Args:
+        - state_names (list): The states indexed by their integer id.
+        - symbols (list): The alphabet symbols indexed by their integer id.
+        - initial_id (int): The integer id of the initial state.
+        - table: The flat transition table, any sequence of ints (a list, or a memoryview over a mapped file).
+        - accept_bitmap: The accept bitmap.
+        - live_bitmap: The live bitmap.
+        - state_index (dict): The inverse of state_names, built if None.
+        - symbol_index (dict): The inverse of symbols, built if None.
+        '''
+        self.state_names = state_names
+        self.symbols = symbols
+        self.state_index = state_index if state_index is not None else {state: i for i, state in enumerate(state_names)}
+        self.symbol_index = symbol_index if symbol_index is not None else {symbol: i for i, symbol in enumerate(symbols)}
+        self.char_alphabet = all(isinstance(symbol, str) and len(symbol) == 1 for symbol in symbols)
+        self.initial_id = initial_id
+        self.dead_state = len(state_names)
+        self.table = table
+        self.accept_bitmap = accept_bitmap
+        self.live_bitmap = live_bitmap
+        self.unknown_code = len(symbols)
+        self.pad_code = len(symbols) + 1
+        # NumPy tables, samplers and the predecessor lists drawn by visualize are built on first use
+        self._np_tables = None
+        self._predecessors = None
+        # the counters of a profile are sized for the previous tables
+        self.__dict__.pop("run", None)
+        self._profile = None
+        self._samplers = {}
+
+    @property
+    def transitions(self) -> dict:
+        '''
+        Dictionary representing the transitions, rebuilt from the table when the DFA was loaded from a compiled file.
+        '''
+        if self._transitions is None:
+            table, width, state_names, symbols = self.table, len(self.symbols), self.state_names, self.symbols
+            self._transitions = {(state_names[i // width], symbols[i % width]): state_names[to_state] for i, to_state in enumerate(table) if to_state != self.dead_state}
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions: dict):
+        self._transitions = transitions
+
+    def run(self, input_string) -> bool:
         '''
         Processes an input string using the DFA and returns True if the string is accepted, False otherwise.
+        A string is read one character per symbol, any other sequence (e.g. a list of tokens) one item per symbol.
         
         Args:
-        - input_string (str): The input string to be processed.
+        - input_string (str or sequence): The input string, or sequence of symbols, to be processed.
         
         Returns:
         - bool: True if the input string is accepted by the DFA, False otherwise.
         '''
-        current_string = self.initial_state
+        table, width, dead_state, symbol_index = self.table, len(self.symbols), self.dead_state, self.symbol_index
+        current_state = self.initial_id
         for s in input_string:
+            symbol = symbol_index.get(s)
             # unrecognized symbol
-            if s not in self.alphabet:
+            if symbol is None:
                 return False
-            try:
-                current_string = self.transitions[(current_string, s)]
-            except:
-                # undefined transition, then the string is rejected
+            current_state = table[current_state * width + symbol]
+            # undefined transition, then the string is rejected
+            if current_state == dead_state:
                 return False
-        return current_string in self.accept_states
+        return self.accept_bitmap[current_state] == 1
     
-    def generate_random_tests(self, n_trials=10, min_k=1, max_k=5) -> list:
+    def profile(self) -> "Profile":
+        '''
+        Enables profiling: until unprofile is called, run (and so bulk_run and generate_random_tests) records state visits, transition hits, rejection reasons, run lengths and latencies.
+        The instance run is replaced by the instrumented one, the class run is unchanged, so DFAs that are not profiled pay nothing.
+        Compiling the DFA again disables profiling.
+        
+        Returns:
+        - Profile: The counters, the current ones if profiling is already enabled. See profiling.Profile for the JSON and Prometheus exports.
+        '''
+        if self._profile is None:
+            from profiling import Profile
+            self._profile = Profile(self)
+            self.run = self._profile.run
+        return self._profile
+
+    def unprofile(self) -> "Profile":
+        '''
+        Disables profiling, run is again the plain DFA.run.
+        
+        Returns:
+        - Profile: The counters collected, None if profiling was not enabled.
+        '''
+        profile, self._profile = self._profile, None
+        self.__dict__.pop("run", None)
+        return profile
+
+    def generate_random_tests(self, n_trials=10, min_k=1, max_k=5, accepted=None) -> list:
         '''
         Generates random input strings and tests them against the DFA.
         
@@ -112,58 +320,362 @@ class DFA:
         - n_trials (int): The number of random input strings to generate and test.
         - min_k (int): The minimum length of the generated input strings.
         - max_k (int): The maximum length of the generated input strings.
+        - accepted (bool): If None, symbols are picked uniformly at random. If True (False), the strings are drawn uniformly among the accepted (rejected) strings with length between min_k and max_k, without rejection sampling.
         
         Returns:
-        - list: A list of tuples containing the input strings and their corresponding results (True if accepted, False otherwise).
+        - list: A list of tuples containing the input strings (tuples of symbols if some symbol is not a single character) and their corresponding results (True if accepted, False otherwise).
         '''
+        if accepted is not None:
+            sampler = self.sampler(accepted)
+            samples = [sampler.sample(min_k, max_k) for i in range(n_trials)]
+            return [(input_string, accepted) for input_string in samples if input_string is not None]
+        import random
         results = []
+        run = self.run
         for i in range(n_trials):
-            input_string = "".join(random.choices(self.alphabet, k=random.randint(min_k, max_k)))
-            results.append((input_string, self.run(input_string)))
+            input_string = self.join(random.choices(self.alphabet, k=random.randint(min_k, max_k)))
+            results.append((input_string, run(input_string)))
         return results
     
+    def sampler(self, accepted=True) -> "Sampler":
+        '''
+        Returns the object counting and uniformly sampling the accepted (or rejected) strings over the alphabet.
+        The counts it computes are kept until the DFA is compiled again.
+        
+        Args:
+        - accepted (bool): True for the accepted strings, False for the rejected ones.
+        
+        Returns:
+        - Sampler: The sampler.
+        '''
+        if accepted not in self._samplers:
+            from sampling import Sampler
+            self._samplers[accepted] = Sampler(self, accepted)
+        return self._samplers[accepted]
+    
     def bulk_run(self, input_strings: list) -> list:
         '''
         Runs a list of input strings through the DFA and returns a list of results.
         
         Args:
-        - input_strings (list): A list of input strings to be processed.
+        - input_strings (list): A list of input strings, or sequences of symbols, to be processed.
         
         Returns:
         - list: A list of tuples containing the input strings and their corresponding results (True if accepted, False otherwise).
         '''
-        return [(input_string, self.run(input_string)) for input_string in input_strings]
+        run = self.run
+        return [(input_string, run(input_string)) for input_string in input_strings]
     
-    def draw(self, file_name=None):
+    def join(self, symbols: list):
         '''
-        Draws a diagram of the DFA. Optionally saves the diagram to a file.
+        Builds an input string from a list of symbols.
+        
+        Args:
+        - symbols (list): The symbols of the string.
+        
+        Returns:
+        - str or tuple: The concatenated symbols if they are all single characters, the tuple of symbols otherwise.
+        '''
+        return "".join(symbols) if self.char_alphabet else tuple(symbols)
+
+    def tokenize(self, text: str, delimiter: str = ",", separator: str = "\n") -> tuple:
+        '''
+        Splits a delimited text into records of symbols and encodes them for run_encoded.
+        Tokens are matched exactly against the symbols, with no whitespace stripping.
+        
+        Args:
+        - text (str): The text, e.g. an event log with one record per line.
+        - delimiter (str): The string between two symbols of a record. If None, any whitespace.
+        - separator (str): The string between two records.
+        
+        Returns:
+        - tuple: The (n_records, max_length) code matrix and the length of each record.
+        '''
+        import batch
+        return batch.tokenize(self, text, delimiter, separator)
+
+    def bulk_run_tokens(self, text: str, delimiter: str = ",", separator: str = "\n") -> "np.ndarray":
+        '''
+        Runs every record of a delimited text through the DFA.
+        
+        Args:
+        - text (str): The text, e.g. an event log with one record per line.
+        - delimiter (str): The string between two symbols of a record. If None, any whitespace.
+        - separator (str): The string between two records.
+        
+        Returns:
+        - np.ndarray: A boolean array, True where the corresponding record is accepted by the DFA.
+        '''
+        codes, _ = self.tokenize(text, delimiter, separator)
+        return self.run_encoded(codes)
+
+    def _numpy_tables(self) -> tuple:
+        '''
+        Builds (once per compile) the NumPy view of the transition table used by the batched API.
+        
+        Returns:
+        - tuple: The 2D transition table with the unknown and pad columns, the boolean accept array and the code point lookup table.
+        '''
+        if self._np_tables is None:
+            import batch
+            self._np_tables = batch.numpy_tables(self)
+        return self._np_tables
+
+    def encode_batch(self, input_strings: list) -> tuple:
+        '''
+        Encodes a batch of input strings into a padded matrix of symbol ids and a vector of lengths.
+        
+        Args:
+        - input_strings (list): A list of input strings to be encoded.
+        
+        Returns:
+        - tuple: The (n_strings, max_length) code matrix, padded with pad_code, and the length of each string.
+        '''
+        import batch
+        _, _, lut = self._numpy_tables()
+        return batch.encode_strings(input_strings, lut, self.pad_code)
+
+    def encode_sequences(self, sequences: list) -> tuple:
+        '''
+        Encodes a batch of symbol sequences (e.g. lists of tokens) into a padded matrix of symbol ids and a vector of lengths.
+        
+        Args:
+        - sequences (list): A list of sequences of symbols.
+        
+        Returns:
+        - tuple: The (n_sequences, max_length) code matrix, padded with pad_code, and the length of each sequence.
+        '''
+        import batch
+        _, _, lut = self._numpy_tables()
+        return batch.encode_sequences(sequences, self.symbol_index, self.unknown_code, self.pad_code, lut.dtype)
+
+    def run_encoded(self, codes: "np.ndarray", lengths: "np.ndarray" = None) -> "np.ndarray":
+        '''
+        Runs an already encoded batch through the DFA, advancing every string one symbol at a time.
+        The codes are used as they are, without copies, so callers can pass their own arrays.
+        
+        Args:
+        - codes (np.ndarray): A (n_strings, max_length) matrix of symbol ids, values must be symbol ids, unknown_code or pad_code.
+        - lengths (np.ndarray): The length of each string. If None, positions after the end of a string must hold pad_code.
+        
+        Returns:
+        - np.ndarray: A boolean array, True where the corresponding string is accepted by the DFA.
+        '''
+        import batch
+        table, accept, _ = self._numpy_tables()
+        return batch.run_lockstep(table, accept, self.initial_id, codes, lengths)
+
+    def bulk_run_batch(self, input_strings: list) -> "np.ndarray":
+        '''
+        Runs a batch of input strings through the DFA in lockstep using NumPy.
+        
+        Args:
+        - input_strings (list): A list of input strings to be processed.
+        
+        Returns:
+        - np.ndarray: A boolean array, True where the corresponding input string is accepted by the DFA.
+        '''
+        codes, _ = self.encode_batch(input_strings)
+        return self.run_encoded(codes)
+    
+    def minimize(self) -> "DFA":
+        '''
+        Returns the equivalent complete DFA with the minimum number of states.
+        Unreachable states are removed, undefined transitions go to an explicit sink state and equivalent states are merged.
+        When the DFA was loaded from a file, the result is cached next to it (<name>.min.json) and reused while the definition is unchanged.
+        
+        Returns:
+        - DFA: The minimized DFA, each state is named after the first state of its equivalence class.
+        '''
+        cache_path = None
+        if self.file_path and not self.file_path.endswith(".min.json"):
+            import hashlib
+            cache_path = os.path.splitext(self.file_path)[0] + ".min.json"
+            source_hash = hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    try:
+                        cached = json.load(f)
+                    except ValueError:
+                        cached = {}
+                if cached.get("sourceHash") == source_hash:
+                    return DFA.from_dict(cached, cache_path)
+
+        minimized = self._minimize()
+        if cache_path:
+            json_data = minimized.to_dict()
+            json_data["sourceHash"] = source_hash
+            with open(cache_path, "w") as f:
+                json.dump(json_data, f, indent=4)
+            minimized.file_path = cache_path
+        return minimized
+
+    def _minimize(self) -> "DFA":
+        '''
+        Minimizes the DFA with Hopcroft's partition refinement, in O(n * k * log n) for n states and k symbols.
+        
+        Returns:
+        - DFA: The minimized DFA.
+        '''
+        table, width = self.table, len(self.symbols)
+
+        # keep only the states reachable from the initial one, the dead state completes the automaton
+        reachable = {self.initial_id: 0}
+        order = [self.initial_id]
+        for state in order:
+            for to_state in table[state * width:(state + 1) * width]:
+                if to_state not in reachable:
+                    reachable[to_state] = len(order)
+                    order.append(to_state)
+        n = len(order)
+        delta = [reachable[to_state] for state in order for to_state in table[state * width:(state + 1) * width]]
+        inverse = [[[] for _ in range(n)] for _ in range(width)]
+        for i, to_state in enumerate(delta):
+            inverse[i % width][to_state].append(i // width)
+
+        # start from accepting / rejecting states and split blocks until every block is consistent
+        accepting = [self.accept_bitmap[state] == 1 for state in order]
+        blocks = [set(q for q in range(n) if accepting[q]), set(q for q in range(n) if not accepting[q])]
+        blocks = [block for block in blocks if block]
+        block_of = [0] * n
+        for b, block in enumerate(blocks):
+            for q in block:
+                block_of[q] = b
+        waiting = {min(range(len(blocks)), key=lambda b: len(blocks[b]))} if blocks else set()
+        while waiting:
+            splitter = list(blocks[waiting.pop()])
+            for symbol in range(width):
+                touched = defaultdict(list)
+                for to_state in splitter:
+                    for q in inverse[symbol][to_state]:
+                        touched[block_of[q]].append(q)
+                for b, members in touched.items():
+                    if len(members) == len(blocks[b]):
+                        continue
+                    new_block = len(blocks)
+                    blocks.append(set(members))
+                    blocks[b].difference_update(members)
+                    for q in members:
+                        block_of[q] = new_block
+                    # a pending block is replaced by both halves, otherwise the smaller half is enough
+                    if b in waiting or len(blocks[new_block]) <= len(blocks[b]):
+                        waiting.add(new_block)
+                    else:
+                        waiting.add(b)
+
+        # name every block after its first state, in the order states were reached
+        names = []
+        used = set(self.state_names)
+        sink = "sink"
+        while sink in used:
+            sink += "_"
+        representative = {}
+        for q in range(n):
+            if block_of[q] not in representative:
+                representative[block_of[q]] = q
+                names.append(sink if order[q] == self.dead_state else self.state_names[order[q]])
+        block_names = {b: names[i] for i, b in enumerate(representative)}
+        return DFA.from_dict({
+            "states": names,
+            "alphabet": list(self.symbols),
+            "transitions": [{"from": block_names[b], "to": block_names[block_of[delta[q * width + symbol]]], "input": self.symbols[symbol]} for b, q in representative.items() for symbol in range(width)],
+            "initialState": block_names[block_of[0]],
+            "acceptStates": [block_names[b] for b, q in representative.items() if accepting[q]],
+        })
+    
+    def intersection(self, *others) -> product.ProductDFA:
+        '''
+        Returns the lazy product accepting the strings accepted by this DFA and by all the others.
         
         Args:
-        - file_path (str): The file path to save the diagram. If None, the diagram will be displayed but not saved.        
+        - others (DFA): The other DFAs.
+        
+        Returns:
+        - ProductDFA: The product automaton, its pair-states are built on demand.
+        '''
+        return product.intersection(self, *others)
+
+    def union(self, *others) -> product.ProductDFA:
+        '''
+        Returns the lazy product accepting the strings accepted by this DFA or by any of the others.
+        
+        Args:
+        - others (DFA): The other DFAs.
+        
+        Returns:
+        - ProductDFA: The product automaton, its pair-states are built on demand.
+        '''
+        return product.union(self, *others)
+
+    def difference(self, other) -> product.ProductDFA:
         '''
-        # adapted from https://github.com/navin-mohan/dfa-minimization/blob/master/dfa.py
-        g = nx.DiGraph()
-        for x in self.states:
-            g.add_node(x, shape='doublecircle' if x in self.accept_states else 'circle', fillcolor='grey' if x == self.initial_state else 'white', style='filled')
+        Returns the lazy product accepting the strings accepted by this DFA and rejected by the other.
         
-        temp = defaultdict(list)
-        for k, v in self.transitions.items():
-            temp[(k[0], v)].append(k[1])
+        Args:
+        - other (DFA): The other DFA.
         
-        for k, v in temp.items():
-            g.add_edge(k[0], k[1], label=','.join(v))
+        Returns:
+        - ProductDFA: The product automaton, its pair-states are built on demand.
+        '''
+        return product.difference(self, other)
+
+    def complement(self) -> product.ProductDFA:
+        '''
+        Returns the lazy automaton accepting the strings over the alphabet that this DFA rejects.
+        Strings with symbols outside the alphabet are still rejected.
         
-        # adapted to handle render and save options
-        dot_representation = nx.drawing.nx_agraph.to_agraph(g).to_string()
-        dfa = Source(dot_representation)
-        if file_name:
-            dfa.render(file_name, format='png', cleanup=True)
-        else:
-            dfa.view()
+        Returns:
+        - ProductDFA: The complement automaton.
+        '''
+        return product.complement(self)
+
+    def is_subset(self, other) -> tuple:
+        '''
+        Checks whether the other DFA accepts every string accepted by this DFA.
+        
+        Args:
+        - other (DFA): The other DFA.
+        
+        Returns:
+        - tuple: True and None if it does, False and a shortest string accepted by this DFA but not by the other otherwise.
+        '''
+        return product.is_subset(self, other)
+
+    def equivalent(self, other) -> tuple:
+        '''
+        Checks whether this DFA and the other accept the same strings.
+        
+        Args:
+        - other (DFA): The other DFA.
+        
+        Returns:
+        - tuple: True and None if they do, False and a shortest string accepted by only one of them otherwise.
+        '''
+        return product.equivalent(self, other)
+    
+    def draw(self, file_name=None, format="png", around=None, hops=1, input_string=None, heat=None):
+        '''
+        Draws a diagram of the DFA. Optionally saves the diagram to a file.
+        The DOT source is written directly from the transition table, see visualize.draw.
+        
+        Args:
+        - file_name (str): The file path to save the diagram. If None, the diagram will be displayed but not saved.
+        - format (str): "png", "svg" or "dot" for the DOT source.
+        - around (str): If set, only the states within hops transitions of this state are drawn.
+        - hops (int): The radius of the neighborhood drawn around a state or the highlighted path.
+        - input_string (str): An input string whose path is highlighted.
+        - heat (Profile): Profiling counters overlaid as a heatmap, e.g. the one returned by profile.
+        
+        Returns:
+        - str: The path of the written file, the DOT source for "dot" without file_name, None when the diagram is only displayed.
+        '''
+        import visualize
+        return visualize.draw(self, file_name, format, around, hops, input_string, heat)
 
 # Usage
-dfa_handler = DFA("merchant.json")
-dfa_handler.draw(file_name="dfa_diagram")
-#print(dfa_handler.generate_random_tests())
-#print(dfa_handler.bulk_run(set(['bbaba', 'aaba', 'ab', 'babba', 'aa', 'bb', 'aaa', 'a', 'b', 'aaba', 'aaba', 'b', 'babaa', 'bbbab', 'a', 'bbbba', 'a', 'ab', 'bbbaa', 'a'])))
-#dfa_handler.draw(file_name="dfa_diagram")
\ No newline at end of file
+if __name__ == "__main__":
+    dfa_handler = DFA("merchant.json")
+    dfa_handler.draw(file_name="dfa_diagram")
+    #print(dfa_handler.generate_random_tests())
+    #print(dfa_handler.bulk_run(set(['bbaba', 'aaba', 'ab', 'babba', 'aa', 'bb', 'aaa', 'a', 'b', 'aaba', 'aaba', 'b', 'babaa', 'bbbab', 'a', 'bbbba', 'a', 'ab', 'bbbaa', 'a'])))
+    #dfa_handler.draw(file_name="dfa_diagram")
\ No newline at end of file
@@ -0,0 +1,159 @@
+import operator
+from itertools import chain, repeat
+import numpy as np
+
+def encode_strings(input_strings: list, lut: np.ndarray, pad_code: int) -> tuple:
+    '''
+    Encodes a batch of input strings into a padded matrix of symbol ids and a vector of lengths.
+    
+    Args:
+    - input_strings (list): A list of input strings to be encoded.
+    - lut (np.ndarray): Lookup table from code point to symbol id, its last entry is used for every code point past its end.
+    - pad_code (int): The symbol id used to pad shorter strings.
+    
+    Returns:
+    - tuple: The (n_strings, max_length) code matrix and the length of each string.
+    '''
+    input_strings = list(input_strings)
+    lengths = np.fromiter(map(len, input_strings), dtype=np.intp, count=len(input_strings))
+    # decode all the code points at once, one byte per character when possible
+    joined = "".join(input_strings)
+    try:
+        flat = lut[np.frombuffer(joined.encode("latin-1"), dtype=np.uint8)]
+    except UnicodeEncodeError:
+        points = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        flat = lut[np.minimum(points, len(lut) - 1)]
+    return pad_codes(flat, lengths, pad_code), lengths
+
+def encode_sequences(sequences: list, symbol_index: dict, unknown_code: int, pad_code: int, dtype=np.int32) -> tuple:
+    '''
+    Encodes a batch of symbol sequences into a padded matrix of symbol ids and a vector of lengths.
+    
+    Args:
+    - sequences (list): A list of sequences of symbols.
+    - symbol_index (dict): Mapping from each symbol to its id.
+    - unknown_code (int): The symbol id of symbols missing from symbol_index.
+    - pad_code (int): The symbol id used to pad shorter sequences.
+    - dtype: The dtype of the code matrix.
+    
+    Returns:
+    - tuple: The (n_sequences, max_length) code matrix and the length of each sequence.
+    '''
+    sequences = list(sequences)
+    lengths = np.fromiter(map(len, sequences), dtype=np.intp, count=len(sequences))
+    # every symbol is looked up once, in C, through the symbol table
+    flat = np.fromiter(map(symbol_index.get, chain.from_iterable(sequences), repeat(unknown_code)), dtype=dtype, count=int(lengths.sum()))
+    return pad_codes(flat, lengths, pad_code), lengths
+
+def pad_codes(flat: np.ndarray, lengths: np.ndarray, pad_code: int) -> np.ndarray:
+    '''
+    Lays out the concatenated symbol ids of a batch into a padded matrix, one row per string.
+    
+    Args:
+    - flat (np.ndarray): The symbol ids of all the strings, one string after the other.
+    - lengths (np.ndarray): The length of each string.
+    - pad_code (int): The symbol id used to pad shorter strings.
+    
+    Returns:
+    - np.ndarray: The (n_strings, max_length) code matrix.
+    '''
+    max_length = int(lengths.max()) if len(lengths) else 0
+    # a row-major boolean mask of the occupied cells lays the symbols out string after string
+    codes = np.full((len(lengths), max_length), pad_code, dtype=flat.dtype)
+    codes[np.arange(max_length) < lengths[:, None]] = flat
+    return codes
+
+def run_lockstep(table: np.ndarray, accept: np.ndarray, initial_id: int, codes: np.ndarray, lengths: np.ndarray = None) -> np.ndarray:
+    '''
+    Advances every row of an encoded batch one symbol at a time through a 2D transition table.
+    
+    Args:
+    - table (np.ndarray): The (n_states, n_codes) transition table.
+    - accept (np.ndarray): Boolean array, True for accepting states.
+    - initial_id (int): The id of the initial state.
+    - codes (np.ndarray): A (n_strings, max_length) matrix of symbol ids.
+    - lengths (np.ndarray): The length of each string. If None, every column is applied to every row.
+    
+    Returns:
+    - np.ndarray: A boolean array, True where the corresponding row ends in an accepting state.
+    '''
+    codes = np.asarray(codes)
+    if codes.ndim != 2:
+        raise ValueError("Error: codes must be a 2D array")
+    states = np.full(codes.shape[0], initial_id, dtype=table.dtype)
+    for i in range(codes.shape[1]):
+        next_states = table[states, codes[:, i]]
+        if lengths is not None:
+            next_states = np.where(lengths > i, next_states, states)
+        states = next_states
+    return accept[states]
+
+def numpy_tables(dfa) -> tuple:
+    '''
+    Builds the NumPy view of the transition table of a DFA used by the batched API.
+
+    Args:
+    - dfa (DFA): The compiled DFA.
+
+    Returns:
+    - tuple: The 2D transition table with the unknown and pad columns, the boolean accept array and the code point lookup table.
+    '''
+    width = len(dfa.symbols)
+    n_rows = dfa.dead_state + 1
+    state_dtype = np.uint8 if n_rows <= 256 else np.int32
+    code_dtype = np.uint8 if width + 2 <= 256 else np.int32
+    table = np.empty((n_rows, width + 2), dtype=state_dtype)
+    table[:, :width] = np.asarray(dfa.table, dtype=state_dtype).reshape(n_rows, width)
+    # unknown symbols lead to the dead state, padding keeps the current state
+    table[:, width] = dfa.dead_state
+    table[:, width + 1] = np.arange(n_rows, dtype=state_dtype)
+    accept = np.frombuffer(bytes(dfa.accept_bitmap), dtype=np.uint8).astype(bool)
+    # only single character symbols can match a character of an input string, the last entry catches every other code point
+    chars = {ord(symbol): code for symbol, code in dfa.symbol_index.items() if isinstance(symbol, str) and len(symbol) == 1}
+    lut = np.full(max(256, max(chars, default=0) + 2), dfa.unknown_code, dtype=code_dtype)
+    for point, code in chars.items():
+        lut[point] = code
+    return table, accept, lut
+
+def tokenize(dfa, text: str, delimiter: str = ",", separator: str = "\n") -> tuple:
+    '''
+    Splits a delimited text into records of symbols and encodes them for run_encoded, see DFA.tokenize.
+
+    Args:
+    - dfa (DFA): The compiled DFA.
+    - text (str): The text, e.g. an event log with one record per line.
+    - delimiter (str): The string between two symbols of a record. If None, any whitespace.
+    - separator (str): The string between two records.
+
+    Returns:
+    - tuple: The (n_records, max_length) code matrix and the length of each record.
+    '''
+    records = text.split(separator)
+    if records and not records[-1]:
+        records.pop()
+    if delimiter is None:
+        return dfa.encode_sequences([record.split() for record in records])
+    # split the whole text at once instead of building one list per record
+    lengths = np.fromiter(map(str.count, records, repeat(delimiter)), dtype=np.intp, count=len(records)) + 1
+    tokens = delimiter.join(records).split(delimiter) if records else []
+    _, _, lut = dfa._numpy_tables()
+    flat = np.fromiter(map(dfa.symbol_index.get, tokens, repeat(dfa.unknown_code)), dtype=lut.dtype, count=len(tokens))
+    empty = np.fromiter(map(operator.not_, records), dtype=bool, count=len(records))
+    if empty.any():
+        # an empty record splits into one empty token, but it is an empty sequence of symbols
+        keep = np.ones(len(flat), dtype=bool)
+        keep[(np.cumsum(lengths) - lengths)[empty]] = False
+        flat, lengths = flat[keep], np.where(empty, 0, lengths)
+    return pad_codes(flat, lengths, dfa.pad_code), lengths
+
+# Usage: python batch.py, checks that the DFA core still imports without NumPy and the drawing backends, which are loaded on demand
+if __name__ == "__main__":
+    import os
+    import sys
+    import subprocess
+
+    heavy = ("numpy", "networkx", "matplotlib", "graphviz")
+    probe = f"import sys, time; start = time.perf_counter(); import DFA; print(time.perf_counter() - start); print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    seconds, loaded = subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.split("\n")[:2]
+    assert not loaded, f"import DFA loads {loaded}"
+    print(f"import DFA: {float(seconds) * 1000:.1f} ms, none of {', '.join(heavy)} loaded")
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from DFA import DFA
+import compiled
+
+# (name, number of states, alphabet size, density) of each benchmarked automaton
+CASES = [
+    ("small", 10, 2, 1.0),
+    ("medium", 1000, 26, 1.0),
+    ("partial", 1000, 26, 0.3),
+    ("large", 20000, 50, 1.0),
+]
+QUICK_CASES = CASES[:3]
+# metrics where a larger value is better, every other metric is a time or a size
+HIGHER_IS_BETTER = ("strings_per_s", "symbols_per_s", "tests_per_s")
+# times shorter than this are timer noise and never flagged
+MIN_SECONDS = 0.001
+# the core must import in this many seconds and without third-party modules
+IMPORT_BUDGET = 0.05
+
+def generate_dfa(n_states: int, n_symbols: int, density: float = 1.0, accept_ratio: float = 0.5, seed: int = 0) -> dict:
+    '''
+    Generates a random DFA definition, in the same schema as the JSON files.
+
+    Args:
+    - n_states (int): The number of states, named q0 to q<n-1>, q0 being the initial state.
+    - n_symbols (int): The alphabet size. Symbols are single characters up to 94 symbols, tokens s0, s1, ... beyond.
+    - density (float): The fraction of (state, symbol) pairs with a transition, 1.0 for a complete DFA.
+    - accept_ratio (float): The fraction of accepting states.
+    - seed (int): The seed of the generator, equal seeds give equal definitions.
+
+    Returns:
+    - dict: The DFA definition.
+    '''
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(n_states)]
+    alphabet = [chr(33 + i) for i in range(n_symbols)] if n_symbols <= 94 else [f"s{i}" for i in range(n_symbols)]
+    transitions = [{"from": state, "to": rng.choice(states), "input": symbol} for state in states for symbol in alphabet if density >= 1.0 or rng.random() < density]
+    return {
+        "states": states,
+        "alphabet": alphabet,
+        "transitions": transitions,
+        "initialState": states[0],
+        "acceptStates": [state for state in states if rng.random() < accept_ratio],
+    }
+
+def generate_strings(dfa: DFA, n: int, min_length: int = 1, max_length: int = 32, seed: int = 0) -> list:
+    '''
+    Generates random input strings over the alphabet of a DFA.
+
+    Args:
+    - dfa (DFA): The DFA.
+    - n (int): The number of strings.
+    - min_length (int): The minimum length of the strings.
+    - max_length (int): The maximum length of the strings.
+    - seed (int): The seed of the generator.
+
+    Returns:
+    - list: The input strings (tuples of symbols for token alphabets, see DFA.join).
+    '''
+    rng = random.Random(seed)
+    return [dfa.join(rng.choices(dfa.symbols, k=rng.randint(min_length, max_length))) for _ in range(n)]
+
+def _best(function, repeat: int) -> float:
+    '''
+    Returns the shortest time of several calls of a function, in seconds.
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def _peak(function) -> int:
+    '''
+    Returns the peak memory allocated by Python during a call of a function, in bytes.
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def import_time() -> dict:
+    '''
+    Measures the import of the DFA core in a fresh interpreter.
+
+    Returns:
+    - dict: The import time in seconds and the number of third-party modules it loaded.
+    '''
+    code = ("import sys, time; before = set(sys.modules); start = time.perf_counter(); import DFA; elapsed = time.perf_counter() - start; "
+            "print(elapsed, sum(1 for m in set(sys.modules) - before if m.split('.')[0] in ('numpy', 'networkx', 'matplotlib', 'graphviz')))")
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times, loaded = [], 0
+    for _ in range(5):
+        output = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(output[0]))
+        loaded = int(output[1])
+    return {"import/seconds": min(times), "import/third_party_modules": loaded}
+
+def bench_case(name: str, n_states: int, n_symbols: int, density: float, n_strings: int = 20000, repeat: int = 3, directory: str = None) -> dict:
+    '''
+    Benchmarks loading, running, sampling and drawing one generated automaton.
+
+    Args:
+    - name (str): The name of the case, used as prefix of its metrics.
+    - n_states (int): See generate_dfa.
+    - n_symbols (int): See generate_dfa.
+    - density (float): See generate_dfa.
+    - n_strings (int): The number of input strings run.
+    - repeat (int): The number of runs of each measurement, the best one is kept.
+    - directory (str): Where the generated JSON file is written.
+
+    Returns:
+    - dict: The metrics, keyed "<name>/<metric>".
+    '''
+    json_path = os.path.join(directory, f"{name}.json")
+    with open(json_path, "w") as f:
+        json.dump(generate_dfa(n_states, n_symbols, density), f)
+    results = {}
+    results["load_json/seconds"] = _best(lambda: DFA(json_path), 1 if n_states > 5000 else repeat)
+    results["load_json/peak_bytes"] = _peak(lambda: DFA(json_path))
+    compiled.load(json_path)
+    results["load_binary/seconds"] = _best(lambda: compiled.load(json_path), repeat)
+    results["load_binary/peak_bytes"] = _peak(lambda: compiled.load(json_path))
+    dfa = DFA(json_path)
+
+    strings = generate_strings(dfa, n_strings)
+    n_symbols_run = sum(map(len, strings))
+    run = dfa.run
+    for metric, function in (("run", lambda: [run(s) for s in strings]), ("bulk_run", lambda: dfa.bulk_run(strings)), ("bulk_run_batch", lambda: dfa.bulk_run_batch(strings))):
+        seconds = _best(function, repeat)
+        results[f"{metric}/strings_per_s"] = n_strings / seconds
+        results[f"{metric}/symbols_per_s"] = n_symbols_run / seconds
+    results["generate_random_tests/tests_per_s"] = 10000 / _best(lambda: dfa.generate_random_tests(10000, 1, 32), repeat)
+    results["draw_dot/seconds"] = _best(lambda: dfa.draw(format="dot"), 1)
+    return {f"{name}/{metric}": value for metric, value in results.items()}
+
+def run_benchmarks(cases: list = CASES, n_strings: int = 20000, repeat: int = 3) -> dict:
+    '''
+    Runs every benchmark.
+
+    Args:
+    - cases (list): The (name, n_states, n_symbols, density) of each automaton.
+    - n_strings (int): The number of input strings run on each automaton.
+    - repeat (int): The number of runs of each measurement, the best one is kept.
+
+    Returns:
+    - dict: The environment and the metrics.
+    '''
+    metrics = import_time()
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases:
+            metrics.update(bench_case(*case, n_strings=n_strings, repeat=repeat, directory=directory))
+    return {"python": platform.python_version(), "machine": platform.machine(), "metrics": metrics}
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    '''
+    Compares results against a baseline. A metric regresses when it is worse than the baseline by more than the tolerance.
+    The import time also regresses past IMPORT_BUDGET, and the import of the core must not load any third-party module.
+
+    Args:
+    - results (dict): The results of run_benchmarks.
+    - baseline (dict): Earlier results of run_benchmarks, None to only check the import budget.
+    - tolerance (float): The allowed relative change.
+
+    Returns:
+    - list: A list of tuples (metric, baseline value, new value, relative change) of the regressions.
+    '''
+    metrics = results["metrics"]
+    regressions = []
+    if metrics["import/seconds"] > IMPORT_BUDGET:
+        regressions.append(("import/seconds", IMPORT_BUDGET, metrics["import/seconds"], metrics["import/seconds"] / IMPORT_BUDGET - 1))
+    if metrics["import/third_party_modules"]:
+        regressions.append(("import/third_party_modules", 0, metrics["import/third_party_modules"], float("inf")))
+    for metric, old in (baseline or {}).get("metrics", {}).items():
+        new = metrics.get(metric)
+        if new is None or not old or metric.startswith("import/"):
+            continue
+        if metric.endswith("/seconds") and max(old, new) < MIN_SECONDS:
+            continue
+        change = new / old - 1
+        worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+        if worse > tolerance:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+# Usage: python bench.py [--quick] [--output bench.json] [--baseline bench_baseline.json] [--save-baseline]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the DFA engine on generated automata.")
+    parser.add_argument("--quick", action="store_true", help="skip the large automaton")
+    parser.add_argument("--strings", type=int, default=20000, help="number of input strings per automaton")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is kept")
+    parser.add_argument("--output", default="bench.json", help="file the results are written to")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before a metric is flagged")
+    parser.add_argument("--save-baseline", action="store_true", help="also store the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(QUICK_CASES if args.quick else CASES, args.strings, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    for metric, value in results["metrics"].items():
+        old = (baseline or {}).get("metrics", {}).get(metric)
+        print(f"{metric:<50} {value:>16,.4f}" + (f" {value / old - 1:>+8.1%}" if old else ""))
+    regressions = compare(results, baseline, args.tolerance)
+    for metric, old, new, change in regressions:
+        print(f"REGRESSION {metric}: {old:,.4f} -> {new:,.4f} ({change:+.1%})")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+from array import array
+from DFA import DFA
+
+MAGIC = b"DFAB"
+VERSION = 1
+# magic, version, source size, source mtime (ns), source sha256, number of states, number of symbols, initial state id, size of the names blob
+HEADER = struct.Struct("<4sHxxQQ32sIIII")
+# the source size and mtime, then the source sha256, at their offset in the header
+SOURCE = struct.Struct("<QQ32s")
+SOURCE_OFFSET = struct.calcsize("<4sHxx")
+
+def validate(json_data) -> list:
+    '''
+    Checks a DFA definition against the schema of the JSON files and checks that every reference in it is defined.
+
+    Args:
+    - json_data (dict): A dictionary containing the DFA definition.
+
+    Returns:
+    - list: The error messages, empty if the definition is valid.
+    '''
+    if not isinstance(json_data, dict):
+        return ["definition must be a JSON object"]
+    required_keys = ["states", "alphabet", "initialState", "acceptStates", "transitions"]
+    missing_keys = [key for key in required_keys if key not in json_data]
+    if missing_keys:
+        return [f"missing keys: {missing_keys}"]
+    errors = []
+    for key in ("states", "alphabet", "acceptStates", "transitions"):
+        if not isinstance(json_data[key], list):
+            errors.append(f"'{key}' must be a list")
+    if errors:
+        return errors
+
+    states, alphabet = json_data["states"], json_data["alphabet"]
+    for key, values in (("states", states), ("alphabet", alphabet)):
+        if not all(isinstance(value, str) for value in values):
+            errors.append(f"'{key}' must only contain strings")
+        elif len(set(values)) != len(values):
+            errors.append(f"duplicate entries in '{key}': {sorted({value for value in values if values.count(value) > 1})}")
+    if errors:
+        return errors
+    state_set, symbol_set = set(states), set(alphabet)
+
+    if json_data["initialState"] not in state_set:
+        errors.append(f"initial state {json_data['initialState']!r} is not in 'states'")
+    for state in json_data["acceptStates"]:
+        if state not in state_set:
+            errors.append(f"accept state {state!r} is not in 'states'")
+
+    seen = {}
+    for i, transition in enumerate(json_data["transitions"]):
+        if not isinstance(transition, dict) or any(key not in transition for key in ("from", "input", "to")):
+            errors.append(f"transition {i} must have 'from', 'input' and 'to'")
+            continue
+        from_state, input_symbol, to_state = transition["from"], transition["input"], transition["to"]
+        if from_state not in state_set:
+            errors.append(f"transition {i} is from unknown state {from_state!r}")
+        if to_state not in state_set:
+            errors.append(f"transition {i} is to unknown state {to_state!r}")
+        if input_symbol not in symbol_set:
+            errors.append(f"transition {i} is on unknown symbol {input_symbol!r}")
+        previous = seen.setdefault((from_state, input_symbol), to_state)
+        if previous != to_state:
+            errors.append(f"transition {i} conflicts with an earlier one: {from_state!r} on {input_symbol!r} goes to {previous!r} and {to_state!r}")
+    return errors
+
+def compile_file(json_path: str, output_path: str = None) -> str:
+    '''
+    Validates a JSON DFA definition and writes its compiled tables to a binary file.
+    The file holds a header, the state and symbol names, the int32 transition table and the accept and live bitmaps, so it can be mapped as is.
+
+    Args:
+    - json_path (str): The path of the JSON file.
+    - output_path (str): The path of the binary file, <name>.dfab next to the JSON file if None.
+
+    Returns:
+    - str: The path of the binary file.
+    '''
+    output_path = output_path or os.path.splitext(json_path)[0] + ".dfab"
+    with open(json_path, "rb") as f:
+        source = f.read()
+        stat = os.fstat(f.fileno())
+    try:
+        json_data = json.loads(source)
+    except ValueError:
+        raise ValueError("Error: file not valid, ensure it is a valid JSON file")
+    errors = validate(json_data)
+    if errors:
+        raise ValueError(f"Error: invalid DFA definition in {json_path}: " + "; ".join(errors))
+
+    dfa = DFA.from_dict(json_data, json_path)
+    names = json.dumps({"states": dfa.state_names, "symbols": dfa.symbols, "acceptStates": list(dfa.accept_states)}).encode()
+    names += b"\0" * (-len(names) % 4)
+    table = array("i", dfa.table)
+    if sys.byteorder == "big":
+        table.byteswap()
+    header = HEADER.pack(MAGIC, VERSION, stat.st_size, stat.st_mtime_ns, hashlib.sha256(source).digest(), dfa.dead_state, len(dfa.symbols), dfa.initial_id, len(names))
+
+    # written next to the target and renamed, a concurrent load never sees a partial file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(names)
+        f.write(table.tobytes())
+        f.write(bytes(dfa.accept_bitmap))
+        f.write(bytes(dfa.live_bitmap))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def _read_header(path: str) -> tuple:
+    '''
+    Reads the header of a binary file.
+
+    Returns:
+    - tuple: The unpacked header fields, or None if the file is missing or is not a compiled DFA of this version.
+    '''
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    fields = HEADER.unpack(header)
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        return None
+    return fields
+
+def _restamp(cache_path: str, stat: os.stat_result, digest: bytes):
+    '''
+    Records the size and modification time of an unchanged JSON file in the header of its binary file (e.g. after a touch or a checkout),
+    so that the next loads do not hash the JSON file again. The header is left as is if the binary file was compiled from other content since.
+    '''
+    try:
+        with open(cache_path, "r+b") as f:
+            f.seek(SOURCE_OFFSET)
+            if SOURCE.unpack(f.read(SOURCE.size))[2] == digest:
+                f.seek(SOURCE_OFFSET)
+                f.write(SOURCE.pack(stat.st_size, stat.st_mtime_ns, digest))
+    except OSError:
+        # a read-only cache still works, the hash is computed on every load
+        pass
+
+def load_binary(path: str, file_path: str = None) -> DFA:
+    '''
+    Loads a DFA from a binary file written by compile_file.
+    The file is memory-mapped: the transition table and the bitmaps are read straight from the mapping, only the names are decoded.
+
+    Args:
+    - path (str): The path of the binary file.
+    - file_path (str): The path of the JSON file the DFA was compiled from, if any.
+
+    Returns:
+    - DFA: The loaded DFA, its transitions dictionary is rebuilt from the table on first access.
+    '''
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _, version, _, _, _, n_states, n_symbols, initial_id, names_size = HEADER.unpack_from(mm)
+    rows = n_states + 1
+    offset = HEADER.size + names_size
+    if len(mm) != offset + rows * n_symbols * 4 + 2 * rows:
+        mm.close()
+        raise ValueError(f"Error: truncated compiled DFA file {path}")
+    names = json.loads(bytes(mm[HEADER.size:offset]).rstrip(b"\0"))
+    view = memoryview(mm)
+    if sys.byteorder == "big":
+        table = array("i", view[offset:offset + rows * n_symbols * 4])
+        table.byteswap()
+    else:
+        table = view[offset:offset + rows * n_symbols * 4].cast("i")
+    offset += rows * n_symbols * 4
+    accept_bitmap = view[offset:offset + rows]
+    live_bitmap = view[offset + rows:offset + 2 * rows]
+
+    dfa = DFA.__new__(DFA)
+    dfa.file_path = file_path or path
+    dfa.states = names["states"]
+    dfa.alphabet = names["symbols"]
+    dfa.initial_state = names["states"][initial_id]
+    dfa.accept_states = names["acceptStates"]
+    dfa.transitions = None
+    dfa._set_tables(names["states"], names["symbols"], initial_id, table, accept_bitmap, live_bitmap)
+    # the tables are views of the mapping, which stays open as long as the DFA
+    dfa._mapping = mm
+    return dfa
+
+def load(json_path: str, verify: bool = False) -> DFA:
+    '''
+    Loads a DFA from its JSON file through the compiled cache (<name>.dfab next to it).
+    The cache is rebuilt, after a full validation of the JSON file, when it is missing or its source hash differs from the JSON file.
+    The hash is only computed when the size or modification time of the JSON file changed, unless verify is True,
+    and when it still matches the new size and modification time are recorded in the cache.
+
+    Args:
+    - json_path (str): The path of the JSON file.
+    - verify (bool): True to always compare the content hash.
+
+    Returns:
+    - DFA: The loaded DFA.
+    '''
+    if not json_path.endswith(".json"):
+        raise ValueError("Error: file must be a JSON file")
+    if not os.path.exists(json_path):
+        raise FileNotFoundError("Error: file not found")
+    cache_path = os.path.splitext(json_path)[0] + ".dfab"
+    fields = _read_header(cache_path)
+    fresh = False
+    if fields is not None:
+        stat = os.stat(json_path)
+        fresh = not verify and (fields[2], fields[3]) == (stat.st_size, stat.st_mtime_ns)
+        if not fresh:
+            with open(json_path, "rb") as f:
+                fresh = hashlib.sha256(f.read()).digest() == fields[4]
+            if fresh and (fields[2], fields[3]) != (stat.st_size, stat.st_mtime_ns):
+                _restamp(cache_path, stat, fields[4])
+    if not fresh:
+        compile_file(json_path, cache_path)
+    return load_binary(cache_path, json_path)
+
+# Usage: python compiled.py dfa.json [output.dfab]
+if __name__ == "__main__":
+    output_path = compile_file(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Compiled {sys.argv[1]} to {output_path}")
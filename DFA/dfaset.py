@@ -0,0 +1,210 @@
+import numpy as np
+from DFA import DFA
+from product import ProductDFA, StateLimitExceeded
+
+class DFASet:
+    '''
+    A collection of DFAs compiled into one engine that reads the input once for all of them.
+    Small collections run on a lazily expanded product, whose states are the tuples of component states.
+    Large ones (or products that grow past max_product_states) run on a vector holding the state of every DFA.
+
+    Attributes:
+    - dfas (list): The DFAs of the collection.
+    - mode (str): "product" or "vector", the engine in use.
+    - symbols (list): The union of the alphabets, indexed by symbol id.
+    - symbol_index (dict): Mapping from each symbol to its id.
+    - max_product_states (int): The largest number of product states built before switching to the vector engine.
+
+    Methods:
+    - from_files(file_paths: list) -> DFASet: Loads every DFA from its JSON file.
+    - accepting(input_string: str) -> list: Returns the indexes of the DFAs accepting the input string.
+    - bulk_accepting(input_strings: list) -> list: Returns the indexes of the accepting DFAs for each input string.
+    - scan(input_string: str): Yields every position where a substring ending there is accepted by some DFA.
+    '''
+    def __init__(self, dfas: list, mode: str = "auto", max_product_states: int = 100000):
+        '''
+        Constructs a new set from compiled DFAs.
+
+        Args:
+        - dfas (list): The DFAs of the collection.
+        - mode (str): "product", "vector" or "auto", which starts with the product and falls back to the vector when it grows too big.
+        - max_product_states (int): The largest number of product states (and of scan states) kept in memory.
+        '''
+        if mode not in ("auto", "product", "vector"):
+            raise ValueError("Error: mode must be 'auto', 'product' or 'vector'")
+        self.dfas = list(dfas)
+        self.max_product_states = max_product_states
+        self._fallback = mode == "auto"
+        self.mode = "vector" if mode == "vector" else "product"
+        self.symbols = []
+        for dfa in self.dfas:
+            self.symbols.extend(symbol for symbol in dfa.symbols if symbol not in self.symbols)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._product = None
+        self._vector = None
+        self._reset_scan()
+
+    @classmethod
+    def from_files(cls, file_paths: list, mode: str = "auto", max_product_states: int = 100000) -> "DFASet":
+        '''
+        Loads every DFA of the collection from its JSON file.
+
+        Args:
+        - file_paths (list): The paths of the JSON files.
+        - mode (str): See __init__.
+        - max_product_states (int): See __init__.
+
+        Returns:
+        - DFASet: The new set.
+        '''
+        return cls([DFA(file_path) for file_path in file_paths], mode, max_product_states)
+
+    def _product_engine(self) -> ProductDFA:
+        '''
+        Returns the lazy product whose value in each state is the tuple of the accepting DFA indexes.
+        '''
+        if self._product is None:
+            limit = self.max_product_states if self._fallback else None
+            self._product = ProductDFA(self.dfas, lambda results: tuple(i for i, result in enumerate(results) if result), limit)
+        return self._product
+
+    def _vector_engine(self) -> tuple:
+        '''
+        Builds the tables of the vector engine: the states of all the DFAs are numbered in one global range.
+
+        Returns:
+        - tuple: The (n_states, n_symbols) global transition table, the initial state of each DFA and the global accept array.
+        '''
+        if self._vector is None:
+            offsets = np.cumsum([0] + [dfa.dead_state + 1 for dfa in self.dfas])
+            table = np.empty((offsets[-1], len(self.symbols)), dtype=np.int32)
+            for dfa, offset in zip(self.dfas, offsets):
+                rows = dfa.dead_state + 1
+                local = np.asarray(dfa.table, dtype=np.int32).reshape(rows, len(dfa.symbols)) + offset
+                for j, symbol in enumerate(self.symbols):
+                    column = dfa.symbol_index.get(symbol)
+                    table[offset:offset + rows, j] = offset + dfa.dead_state if column is None else local[:, column]
+            initial = np.array([offset + dfa.initial_id for dfa, offset in zip(self.dfas, offsets)], dtype=np.int32)
+            accept = np.concatenate([np.frombuffer(bytes(dfa.accept_bitmap), dtype=np.uint8) for dfa in self.dfas]).astype(bool) if self.dfas else np.zeros(0, dtype=bool)
+            self._vector = (table, initial, accept)
+        return self._vector
+
+    def accepting(self, input_string: str) -> list:
+        '''
+        Processes an input string once for all the DFAs.
+
+        Args:
+        - input_string (str): The input string to be processed.
+
+        Returns:
+        - list: The indexes (in dfas) of the DFAs accepting the input string.
+        '''
+        if self.mode == "product":
+            try:
+                return list(self._product_engine().evaluate(input_string))
+            except StateLimitExceeded:
+                if not self._fallback:
+                    raise
+                self.mode, self._product = "vector", None
+        table, states, accept = self._vector_engine()
+        symbol_index = self.symbol_index
+        for s in input_string:
+            symbol = symbol_index.get(s)
+            # unrecognized symbol, every DFA rejects
+            if symbol is None:
+                return []
+            states = table[states, symbol]
+        return np.flatnonzero(accept[states]).tolist()
+
+    def bulk_accepting(self, input_strings: list) -> list:
+        '''
+        Processes a list of input strings once for all the DFAs.
+
+        Args:
+        - input_strings (list): A list of input strings to be processed.
+
+        Returns:
+        - list: A list of tuples containing the input strings and the indexes of the DFAs accepting them.
+        '''
+        return [(input_string, self.accepting(input_string)) for input_string in input_strings]
+
+    def _reset_scan(self):
+        '''
+        Drops the states built by scan. Each scan state holds, for every DFA, the set of states of the matches still running.
+        '''
+        self._scan_index = {}
+        self._scan_keys = []
+        self._scan_hits = []
+        self._scan_delta = {}
+
+    def _scan_state(self, key: tuple) -> int:
+        '''
+        Returns the id of a scan state, creating it on first sight.
+
+        Args:
+        - key (tuple): For every DFA, the frozenset of its running states.
+
+        Returns:
+        - int: The id of the scan state.
+        '''
+        sid = self._scan_index.get(key)
+        if sid is None:
+            sid = self._scan_index[key] = len(self._scan_keys)
+            self._scan_keys.append(key)
+            self._scan_hits.append(tuple(i for i, (dfa, states) in enumerate(zip(self.dfas, key)) if any(dfa.accept_bitmap[state] for state in states)))
+        return sid
+
+    def _scan_next(self, sid: int, symbol: int) -> int:
+        '''
+        Returns the scan state reached with a symbol, a new match starts at every position.
+
+        Args:
+        - sid (int): The id of the scan state.
+        - symbol (int): The symbol id.
+
+        Returns:
+        - int: The id of the next scan state.
+        '''
+        next_id = self._scan_delta.get(sid * len(self.symbols) + symbol)
+        if next_id is None:
+            key = []
+            for dfa, states in zip(self.dfas, self._scan_keys[sid]):
+                column = dfa.symbol_index.get(self.symbols[symbol])
+                if column is None:
+                    key.append(frozenset())
+                    continue
+                width = len(dfa.symbols)
+                next_states = {dfa.table[state * width + column] for state in states | {dfa.initial_id}}
+                next_states.discard(dfa.dead_state)
+                key.append(frozenset(next_states))
+            next_id = self._scan_delta[sid * len(self.symbols) + symbol] = self._scan_state(tuple(key))
+        return next_id
+
+    def scan(self, input_string: str):
+        '''
+        Reads an input string once and finds every position where a non-empty substring ending there is accepted by some DFA.
+        Scan states are built on demand and dropped when they exceed max_product_states.
+
+        Args:
+        - input_string (str): The input string to be scanned.
+
+        Yields:
+        - tuple: The end position (exclusive) of the accepted substrings and the tuple of the indexes of the DFAs accepting them.
+        '''
+        empty = tuple(frozenset() for _ in self.dfas)
+        symbol_index = self.symbol_index
+        sid = self._scan_state(empty)
+        for position, s in enumerate(input_string):
+            symbol = symbol_index.get(s)
+            # unrecognized symbol, no substring containing it is accepted
+            if symbol is None:
+                sid = self._scan_state(empty)
+                continue
+            if len(self._scan_keys) > self.max_product_states:
+                key = self._scan_keys[sid]
+                self._reset_scan()
+                sid = self._scan_state(key)
+            sid = self._scan_next(sid, symbol)
+            hits = self._scan_hits[sid]
+            if hits:
+                yield position + 1, hits
@@ -0,0 +1,223 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+class FakeOllama:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token_rate: Optional[float] = None, ttft: float = 0.0, reply_tokens: int = 20,
+                 error_rate: float = 0.0, error_mode: str = "status", intents: Optional[list] = None, next_states: Optional[list] = None, seed: int = 0):
+        """
+        A local stand-in for the Ollama server, to test and benchmark the clients and the NPCs without a model.
+
+        It implements POST /api/generate, streaming NDJSON chunks like Ollama, and recognizes the requests of the NPCs:
+        - an empty prompt loads the model, the answer is only the done chunk;
+        - a request with a `format` schema gets a JSON object, the enum fields set to one of their values;
+        - an intent classification ("classify ... into one of these intents: a, b: ...") gets one of the listed intents;
+        - a prompt with a "Next State: A, B" line gets a reply ending with "Next State: <one of them>";
+        - any other prompt gets reply_tokens words.
+        Intents and next states are taken in turn from the scripts when given, otherwise picked at random among the legal ones.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port, 0 for any free port.
+            token_rate (float): Tokens per second, None to send them as fast as possible.
+            ttft (float): Seconds before the first token.
+            reply_tokens (int): The number of tokens of a reply.
+            error_rate (float): The probability of a failed request.
+            error_mode (str): How requests fail: "status" (HTTP 500), "chunk" (an error chunk in the stream) or "disconnect" (connection closed mid-stream).
+            intents (list): The intents answered, in turn, to the classification requests.
+            next_states (list): The next states announced, in turn, at the end of the autonomous replies.
+            seed (int): The seed of the random choices.
+        """
+        self.token_rate = token_rate
+        self.ttft = ttft
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_mode = error_mode
+        self.scripts = {"intent": list(intents or []), "next_state": list(next_states or [])}
+        self._positions = {"intent": 0, "next_state": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.server = _Server((host, port), _Handler)
+        self.server.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server, for the clients."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        """Clear the counters of the requests served."""
+        self.requests = 0
+        self.tokens = 0
+        self.errors = 0
+        self.disconnects = 0
+        # the time the requests would take without any overhead: ttft plus the tokens at token_rate
+        self.ideal_seconds = 0.0
+
+    def start(self) -> "FakeOllama":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _pick(self, kind: str, options: list) -> str:
+        """Return the next scripted answer of a kind, or a random legal one."""
+        with self._lock:
+            script = self.scripts[kind]
+            if script:
+                answer = script[self._positions[kind] % len(script)]
+                self._positions[kind] += 1
+                return answer
+            return self._random.choice(options) if options else ""
+
+    def _fails(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def tokens_for(self, body: dict) -> list:
+        """Return the tokens answered to a request."""
+        prompt = body.get("prompt", "")
+        if not prompt:
+            return []
+        words = [f"word{i} " for i in range(self.reply_tokens)]
+        schema = body.get("format")
+        if isinstance(schema, dict):
+            answer = {}
+            for name, field in schema.get("properties", {}).items():
+                answer[name] = self._pick("intent", field["enum"]) if "enum" in field else "".join(words).strip()
+            text = json.dumps(answer)
+            # about four characters per token, like a real tokenizer
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+        if "classify" in prompt and "intents: " in prompt:
+            options = prompt.split("intents: ", 1)[1].split(":", 1)[0]
+            return [self._pick("intent", [option.strip() for option in options.split(",") if option.strip()])]
+        lines = [line.strip() for line in prompt.splitlines() if line.strip().startswith("Next State:")]
+        if lines:
+            options = [option.strip() for option in lines[-1][len("Next State:"):].split(".")[0].split(",") if option.strip()]
+            return words + ["Next State: ", self._pick("next_state", options)]
+        return words
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops the connections of bursts of clients, which then wait a second to retry
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients closing their idle pooled connections are not errors
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # like Ollama: without it every small chunk after the first waits for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: dict):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        tokens = fake.tokens_for(body)
+        fails = fake._fails()
+        with fake._lock:
+            fake.requests += 1
+            fake.errors += fails
+        if fails and fake.error_mode == "status":
+            self._send_json(500, {"error": "injected failure"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        start = time.perf_counter()
+        interval = 1 / fake.token_rate if fake.token_rate else 0.0
+        model = body.get("model", "")
+        sent = 0
+        try:
+            if tokens and fake.ttft:
+                time.sleep(fake.ttft)
+            for i, token in enumerate(tokens):
+                if fails and i == len(tokens) // 2:
+                    if fake.error_mode == "disconnect":
+                        self.close_connection = True
+                        return
+                    self._write_chunk({"error": "injected failure"})
+                    break
+                if i and interval:
+                    # tokens are sent on schedule, the time spent writing is not added to the interval
+                    delay = start + fake.ttft + i * interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._write_chunk({"model": model, "response": token, "done": False})
+                sent += 1
+            else:
+                self._write_chunk({"model": model, "response": "", "done": True, "done_reason": "stop", "context": [fake.requests], "eval_count": sent})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client closed the stream early, e.g. once it parsed what it needed
+            self.close_connection = True
+            with fake._lock:
+                fake.disconnects += 1
+        finally:
+            with fake._lock:
+                fake.tokens += sent
+                fake.ideal_seconds += (fake.ttft if tokens else 0.0) + sent * interval
+
+# Usage: python fake_ollama.py [--port 11434] [--token-rate 50] [--ttft 0.2] [--error-rate 0.01] [--intents see_items,want_to_buy]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves a fake Ollama /api/generate for tests and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=None, help="tokens per second, unlimited by default")
+    parser.add_argument("--ttft", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--reply-tokens", type=int, default=20, help="tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a failed request")
+    parser.add_argument("--error-mode", choices=("status", "chunk", "disconnect"), default="status")
+    parser.add_argument("--intents", default="", help="comma separated intents answered in turn")
+    parser.add_argument("--next-states", default="", help="comma separated next states announced in turn")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, args.token_rate, args.ttft, args.reply_tokens, args.error_rate, args.error_mode,
+                      [intent for intent in args.intents.split(",") if intent], [state for state in args.next_states.split(",") if state])
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
@@ -0,0 +1,399 @@
+import re
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+# words that can turn an example phrase into its opposite, e.g. "deal" in "no deal", normalized without apostrophes
+NEGATIONS = frozenset(["no", "not", "dont", "never", "nothing", "without", "nope", "nah", "cant", "cannot", "wont", "doesnt", "isnt", "didnt"])
+
+class IntentResolver:
+    def __init__(self, examples: Optional[dict] = None, cache_size: int = 1024, ttl: Optional[float] = 600.0, threshold: float = 0.6, margin: float = 0.1):
+        """
+        Classify player utterances into intents, calling the LLM only when cheaper layers cannot answer.
+
+        The layers are tried in order:
+        1. a LRU cache of the earlier answers, keyed on (state, normalized utterance), whose entries expire after ttl seconds;
+        2. a local classifier comparing the utterance with example phrases of each intent;
+        3. the LLM, for the ambiguous cases. Its answer is cached when it is one of the legal intents.
+
+        One resolver can be shared by every NPC of the same character, so that all the players warm the same cache.
+
+        Args:
+            examples (dict): The example phrases of each intent, e.g. {"greetings": ["hi", "hello"]}.
+            cache_size (int): The largest number of cached answers, 0 to disable the cache.
+            ttl (float): Seconds a cached answer stays valid, None for no expiry.
+            threshold (float): The lowest score, between 0 and 1, of a local answer.
+            margin (float): How much the best local score must beat the second best one, otherwise the LLM decides.
+        """
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.margin = margin
+        self._cache = OrderedDict()
+        self._examples = {}
+        for intent, phrases in (examples or {}).items():
+            self.add_examples(intent, phrases)
+        self.reset_metrics()
+
+    @staticmethod
+    def normalize(utterance: str) -> str:
+        """Lower case the utterance, drop apostrophes, turn other punctuation into spaces and collapse the spaces."""
+        return " ".join(re.sub(r"[^\w\s]", " ", utterance.lower().replace("'", "").replace("’", "")).split())
+
+    @staticmethod
+    def _grams(text: str) -> frozenset:
+        """The words, word bigrams and character trigrams of a normalized text."""
+        words = text.split()
+        padded = f" {text} "
+        return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])] + [padded[i:i + 3] for i in range(len(padded) - 2)])
+
+    def add_examples(self, intent: str, phrases: list):
+        """Add example phrases of an intent to the local classifier."""
+        examples = self._examples.setdefault(intent, [])
+        for phrase in phrases:
+            text = self.normalize(phrase)
+            examples.append((f" {text} ", len(text.split()), self._grams(text)))
+
+    def reset_metrics(self):
+        """Clear the hit and miss counters."""
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_expired = 0
+        self.local_hits = 0
+        self.llm_calls = 0
+
+    def lookup(self, state: str, utterance: str) -> Optional[str]:
+        """Return the cached intent of an utterance in a state, None if it is not cached or expired."""
+        key = (state, self.normalize(utterance))
+        entry = self._cache.get(key)
+        if entry is not None:
+            intent, expires = entry
+            if expires is None or expires > time.monotonic():
+                self._cache.move_to_end(key)
+                return intent
+            del self._cache[key]
+            self.cache_expired += 1
+        return None
+
+    def store(self, state: str, utterance: str, intent: str):
+        """Cache the intent of an utterance in a state, evicting the least recently used entry when the cache is full."""
+        if self.cache_size <= 0:
+            return
+        key = (state, self.normalize(utterance))
+        self._cache[key] = (intent, None if self.ttl is None else time.monotonic() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def scores(self, utterance: str, intents: list) -> dict:
+        """
+        Score an utterance against the examples of each intent, between 0 and 1.
+
+        An example found as a whole phrase in the utterance scores from 0.5 to 1 by the share of the utterance it covers,
+        so the longest matching phrase wins. Otherwise the score is the Dice similarity of the words, bigrams and trigrams.
+
+        Args:
+            utterance (str): What the player said.
+            intents (list): The intents to score.
+
+        Returns:
+            The best score of each intent that has examples.
+        """
+        text = self.normalize(utterance)
+        padded = f" {text} "
+        n_words = max(len(text.split()), 1)
+        grams = self._grams(text)
+        scores = {}
+        for intent in intents:
+            best = 0.0
+            for phrase, length, phrase_grams in self._examples.get(intent, ()):
+                if phrase in padded:
+                    score = 0.5 + 0.5 * min(length / n_words, 1.0)
+                else:
+                    score = 2 * len(grams & phrase_grams) / (len(grams) + len(phrase_grams) or 1)
+                best = max(best, score)
+            if intent in self._examples:
+                scores[intent] = best
+        return scores
+
+    def classify(self, utterance: str, intents: list) -> Optional[str]:
+        """
+        Return the intent the local classifier is confident about, None if the utterance is ambiguous.
+
+        An utterance with a negation is only answered locally when an example of the best intent holding the same negations
+        is found as a whole phrase in it, e.g. "no thanks" but not "no deal", so that negated phrases are left to the LLM.
+        """
+        ranked = sorted(self.scores(utterance, intents).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.threshold or (len(ranked) > 1 and ranked[0][1] - ranked[1][1] < self.margin):
+            return None
+        intent = ranked[0][0]
+        text = self.normalize(utterance)
+        negations = NEGATIONS.intersection(text.split())
+        if negations:
+            padded = f" {text} "
+            if not any(phrase in padded and negations.issubset(phrase.split()) for phrase, _, _ in self._examples[intent]):
+                return None
+        return intent
+
+    def resolve_local(self, state: str, utterance: str, intents: list) -> Optional[str]:
+        """Try the cache, then the local classifier, counting the hits and misses. Return None when the LLM has to decide."""
+        intent = self.lookup(state, utterance)
+        if intent is not None and intent in intents:
+            self.cache_hits += 1
+            return intent
+        self.cache_misses += 1
+        intent = self.classify(utterance, intents)
+        if intent is not None:
+            self.local_hits += 1
+            self.store(state, utterance, intent)
+        return intent
+
+    def learn(self, state: str, utterance: str, intents: list, intent: str):
+        """Count an answer of the LLM, given after resolve_local returned None, and cache it if it is a legal intent."""
+        self.llm_calls += 1
+        if intent in intents:
+            self.store(state, utterance, intent)
+
+    def resolve(self, state: str, utterance: str, intents: list, llm: Callable[[], str]) -> str:
+        """
+        Return the intent of an utterance, calling llm only when the cache and the local classifier cannot answer.
+
+        Args:
+            state (str): The current state of the NPC.
+            utterance (str): What the player said.
+            intents (list): The legal intents in the state.
+            llm (Callable): Asks the LLM and returns its answer.
+
+        Returns:
+            The intent. An answer of the LLM is returned even when it is not a legal intent, but only legal ones are cached.
+        """
+        intent = self.resolve_local(state, utterance, intents)
+        if intent is None:
+            intent = llm()
+            self.learn(state, utterance, intents, intent)
+        return intent
+
+    async def resolve_async(self, state: str, utterance: str, intents: list, llm: Callable[[], Awaitable[str]]) -> str:
+        """Asyncio version of resolve, llm returns an awaitable."""
+        intent = self.resolve_local(state, utterance, intents)
+        if intent is None:
+            intent = await llm()
+            self.learn(state, utterance, intents, intent)
+        return intent
+
+    def metrics(self) -> dict:
+        """Return the hit and miss counters, and how many LLM calls the cache and the local classifier avoided."""
+        resolved = self.cache_hits + self.local_hits + self.llm_calls
+        return {
+            "resolved": resolved,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_expired": self.cache_expired,
+            "cache_size": len(self._cache),
+            "local_hits": self.local_hits,
+            "llm_calls": self.llm_calls,
+            "llm_calls_avoided": self.cache_hits + self.local_hits,
+            "llm_call_ratio": self.llm_calls / resolved if resolved else 0.0,
+        }
+
+# the characters escaped in JSON strings
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+def turn_schema(intents: list) -> dict:
+    """The JSON schema of a structured turn: the intent, one of the legal ones, then the reply."""
+    return {
+        "type": "object",
+        "properties": {"intent": {"type": "string", "enum": list(intents)}, "reply": {"type": "string"}},
+        "required": ["intent", "reply"],
+    }
+
+class StructuredTurnParser:
+    def __init__(self, stream_field: str = "reply"):
+        """
+        Parse a flat JSON object while it is streamed, e.g. {"intent": "see_items", "reply": "Welcome..."} generated with turn_schema.
+
+        Every field is available in self.fields as soon as its value is complete, and the text of stream_field is returned by feed as it arrives,
+        so the intent can be acted upon and the reply shown before the generation ends.
+
+        Args:
+            stream_field (str): The field whose text is streamed.
+        """
+        self.stream_field = stream_field
+        self.fields = {}
+        self.text = ""
+        self._mode = "key"
+        self._key = ""
+        self._value = []
+        self._escape = None
+        self._high_surrogate = None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Parse the next chunk of the object.
+
+        Args:
+            chunk (str): The next tokens.
+
+        Returns:
+            The text of the streamed field decoded from the chunk, possibly empty.
+        """
+        self.text += chunk
+        out = []
+        for c in chunk:
+            mode = self._mode
+            if mode == "key":
+                if c == '"':
+                    self._mode, self._key = "in_key", ""
+            elif mode == "in_key":
+                if c == '"':
+                    self._mode = "colon"
+                else:
+                    self._key += c
+            elif mode == "colon":
+                if c == ":":
+                    self._mode = "value"
+            elif mode == "value":
+                if c == '"':
+                    self._mode, self._value = "string", []
+                elif not c.isspace():
+                    self._mode, self._value = "other", [c]
+            elif mode == "other":
+                # numbers, booleans and null end at the next separator
+                if c in ",}":
+                    self._set("".join(self._value).strip())
+                    self._mode = "key"
+                else:
+                    self._value.append(c)
+            else:
+                decoded = None
+                if self._escape is not None:
+                    self._escape += c
+                    if self._escape[0] != "u":
+                        decoded, self._escape = ESCAPES.get(c, c), None
+                    elif len(self._escape) == 5:
+                        code, self._escape = int(self._escape[1:], 16), None
+                        if 0xD800 <= code < 0xDC00:
+                            self._high_surrogate = code
+                        elif 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                            decoded = chr(0x10000 + (self._high_surrogate - 0xD800) * 0x400 + code - 0xDC00)
+                            self._high_surrogate = None
+                        else:
+                            decoded = chr(code)
+                elif c == "\\":
+                    self._escape = ""
+                elif c == '"':
+                    self.fields[self._key] = "".join(self._value)
+                    self._mode = "key"
+                else:
+                    decoded = c
+                if decoded is not None:
+                    self._value.append(decoded)
+                    if self._key == self.stream_field:
+                        out.append(decoded)
+        return "".join(out)
+
+    def _set(self, raw: str):
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except ValueError:
+            self.fields[self._key] = raw
+
+class NextStateParser:
+    def __init__(self, states: list, marker: str = "Next State:"):
+        """
+        Find a "Next State: <state>" marker while a reply is streamed and decide the state as soon as its name is complete,
+        so that the stream can be closed without waiting for the rest of the generation.
+
+        Args:
+            states (list): The legal next states, any other name is rejected.
+            marker (str): The text announcing the next state.
+        """
+        self.states = list(states)
+        self.marker = marker
+        self.text = ""
+        self.state = None
+        self.done = False
+        self._emitted = 0
+
+    def feed(self, chunk: str) -> str:
+        """
+        Parse the next chunk of the reply.
+
+        Args:
+            chunk (str): The next tokens.
+
+        Returns:
+            The text of the reply before the marker that can be shown, possibly empty. A partial marker is held back until it is complete.
+        """
+        if self.done:
+            return ""
+        self.text += chunk
+        start = self.text.find(self.marker)
+        if start < 0:
+            # hold back the end of the text if it may be the beginning of the marker
+            end = len(self.text)
+            for size in range(min(len(self.marker) - 1, len(self.text)), 0, -1):
+                if self.marker.startswith(self.text[-size:]):
+                    end -= size
+                    break
+        else:
+            end = start
+            self._decide(self.text[start + len(self.marker):], final=False)
+        visible = self.text[self._emitted:end] if end > self._emitted else ""
+        self._emitted = max(self._emitted, end)
+        return visible
+
+    def finish(self) -> Optional[str]:
+        """Decide the state at the end of the stream. Return the state, None if the marker or a legal state is missing."""
+        start = self.text.find(self.marker)
+        if not self.done and start >= 0:
+            self._decide(self.text[start + len(self.marker):], final=True)
+        self.done = True
+        return self.state
+
+    def _decide(self, tail: str, final: bool):
+        """Match the text after the marker against the legal states, once no longer legal state can follow."""
+        # skip whitespace, line breaks included, and decorations before the name, like ** or [,
+        # the name ends at the first other punctuation or line break after it
+        tail = tail.lstrip(" \t\r\n*[\"'`")
+        name = ""
+        for c in tail:
+            if not (c.isalnum() or c in " _-"):
+                final = True
+                break
+            name += c
+        name = " ".join(name.lower().split())
+        exact = [state for state in self.states if state.lower() == name]
+        # a longer legal state may still follow, e.g. "Looking" before "Looking For"
+        longer = [state for state in self.states if state.lower().startswith(name) and state.lower() != name]
+        if not final and (longer or not name):
+            return
+        if exact:
+            self.state = exact[0]
+        else:
+            # the name runs past a legal state, e.g. "Idle You need rest": the longest legal prefix wins
+            prefixes = [state for state in self.states if name.startswith(state.lower() + " ")]
+            self.state = max(prefixes, key=len) if prefixes else None
+        self.done = True
+
+# Usage: python intents.py, checks the local classifier of the merchant
+if __name__ == "__main__":
+    from npc import load_character
+
+    merchant = load_character("merchant.json")
+    resolver = IntentResolver(merchant.intent_examples)
+    # negated phrases are left to the LLM and not cached
+    for state, utterance in [("Negotiation", "no deal"), ("Negotiation", "that is not a deal"), ("Shop", "I do not want this"), ("Shop", "i dont want to buy anything")]:
+        assert resolver.resolve_local(state, utterance, merchant.intents[state]) is None, utterance
+        assert resolver.lookup(state, utterance) is None, utterance
+    # examples holding the negation are still answered locally
+    for state, utterance, intent in [("Negotiation", "no thanks", "dont_want_to_buy"), ("Negotiation", "deal", "agree_deal"), ("Shop", "i want to buy", "want_to_buy")]:
+        assert resolver.resolve_local(state, utterance, merchant.intents[state]) == intent, utterance
+    # the next state may follow the marker on the next line, in one chunk or as it streams
+    for chunks, state in ((["Next State:\nIdle"], "Idle"), (["Next State: ", "\n", "Idle"], "Idle"), (["Next State:\r\n**Looking For**\n"], "Looking For")):
+        parser = NextStateParser(["Idle", "Looking", "Looking For"])
+        for chunk in chunks:
+            parser.feed(chunk)
+        assert parser.finish() == state, chunks
+    print(resolver.metrics())
@@ -1,140 +1,342 @@
-import requests
-import json
-from typing import Generator, Optional
-import sys
-
-class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        """Initialize Ollama client with base URL."""
-        self.base_url = base_url.rstrip('/')
-        
-    def generate_stream(self, payload: dict) -> Generator[str, None, None]:
-        """
-        Generate streaming response from Ollama.
-        
-        Args:
-            payload (dict): The request payload to send to Ollama.
-            
-        Yields:
-            Stream of tokens from the response
-        """
-        url = f"{self.base_url}/api/generate"
-        
-        try:
-            # Make streaming request
-            with requests.post(url, json=payload, stream=True) as response:
-                response.raise_for_status()
-                
-                # Process the stream
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        if 'error' in chunk:
-                            raise Exception(chunk['error'])
-                        if 'response' in chunk:
-                            yield chunk['response']
-                        if chunk.get('done', False):
-                            break
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to communicate with Ollama: {str(e)}")
+from typing import Optional
+import asyncio
+from collections import deque
+from ollama import OllamaClient, AsyncOllamaClient
+from intents import IntentResolver, StructuredTurnParser, turn_schema
+from npc import Character, load_character
 
 class MerchantDFA:
-    def __init__(self, model="llama3.2"):
+    def __init__(self, model=None, client: Optional[OllamaClient] = None, async_client: Optional[AsyncOllamaClient] = None, resolver: Optional[IntentResolver] = None,
+                 speculate: int = 0, speculation_slots: Optional[asyncio.Semaphore] = None, structured: bool = False,
+                 history_size: Optional[int] = 20, summarize: bool = False, max_context_turns: int = 8, character: Optional[Character] = None):
+        # the FSM, the prompts and the model parameters, compiled once from merchant.json and shared by every merchant
+        self.character = character or load_character("merchant.json")
         # Initial state
         self.previous_state = None
-        self.actual_state = "Introduction"
-        self.model = model
+        self.actual_state = self.character.initial_state
+        self.model = model or self.character.model
         self.api_base = "http://localhost:11434"
-        self.history = []
-        self.client = OllamaClient(self.api_base)
-        
-        # Find the corresponding transition based on the current state and the intent
-        self.transitions = [
-            {"from": "Introduction", "to": "Introduction", "input": "greetings"},
-            {"from": "Introduction", "to": "Shop", "input": "see_items"},
-            {"from": "Shop", "to": "Negotiation", "input": "price_negotiation"},
-            {"from": "Shop", "to": "Final Offer", "input": "want_to_buy"},
-            {"from": "Shop", "to": "Suspicion", "input": "doubt_quality"},
-            {"from": "Suspicion", "to": "Suspicion", "input": "persist_questioning"},
-            {"from": "Suspicion", "to": "Negotiation", "input": "convinced_to_buy"},
-            {"from": "Suspicion", "to": "End", "input": "dont_want_to_buy"},
-            {"from": "Negotiation", "to": "Final Offer", "input": "agree_deal"},
-            {"from": "Negotiation", "to": "Negotiation", "input": "negotiate_more"},
-            {"from": "Negotiation", "to": "End", "input": "dont_want_to_buy"},
-            {"from": "Negotiation", "to": "Suspicion", "input": "doubt_quality"},
-            {"from": "Final Offer", "to": "End", "input": "accept_deal"},
-            {"from": "Final Offer", "to": "Suspicion", "input": "change_mind"},
-        ]
-        
-        # System prompt
-        self.system_prompt = """You are a mysterious traveling merchant named Gideon in a fantasy world. Depending on the player’s responses, you may adjust your prices or reveal more information about your goods. You are not so easily influenced by the negotiation skill of the player. You must talk in first person, don't simulate a dialogue or actions, you are talking with the player. I will handle the player's responses."""
+        # the last replies of the merchant, the oldest are dropped (or folded into the summary, if summarize) past history_size
+        self.history = deque(maxlen=history_size)
+        self.summarize = summarize
+        self.summary = ""
+        # the context returned by Ollama after the last reply, continuing from it skips re-processing the system and state prompts.
+        # It is only valid while the state, hence the state prompt, stays the same, and is rebuilt from scratch every max_context_turns replies.
+        self.context = None
+        self.context_state = None
+        self.context_turns = 0
+        self.max_context_turns = max_context_turns
+        # a shared client reuses its pooled connections, NPCs run by a SessionManager only use the asyncio one
+        self.async_client = async_client
+        self.client = client or (None if async_client else OllamaClient(self.api_base))
+        # the cache and the local classifier answer most utterances without the LLM, share the resolver between NPCs to share the cache
+        self.resolver = resolver or IntentResolver(self.character.intent_examples)
+        # speculative mode (change_state_async only): while the LLM classifies the intent, the replies of up to `speculate` likely next states
+        # are generated too, the one of the state actually reached is kept and the others are cancelled.
+        # speculation_slots, shared between NPCs, caps the speculative streams running at once: no free slot, no speculation.
+        self.speculate = speculate
+        self.speculation_slots = speculation_slots
+        self.speculations_started = 0
+        self.speculations_used = 0
+        # structured mode: when the LLM has to classify the intent, one request constrained by a JSON schema returns the intent, among the legal ones, and the reply
+        self.structured = structured
 
-        # State-specific prompts that build on the system prompt
-        self.prompts = {
-        "Introduction": """You are Gideon, a mysterious traveling merchant. You meet a potential customer and offer rare items at high prices. Pay attention to what the customer says and respond accordingly. If they show interest in your wares, engage with them. If they express doubt or try to negotiate, respond with confidence and reassurance.""",
+    def legal_intents(self):
+        """Return the intents with a transition from the current state."""
+        return list(self.character.intents.get(self.actual_state, ()))
 
-        "Shop": """List your available items in the following form: '<items>: <price in euros>'. If the customer attempts to negotiate the prices, offer them a chance to engage. If they show respect for your craft, acknowledge their appreciation. If they express doubt about the quality or the prices, respond with confidence and reassurance.""",
+    def intent_payload(self, user_response, actual_state, l):
+        """Build the request classifying the user response into one of the intents in l."""
+        prompt = f"This is the last response of the merchant:\n\n MERCHANT: {self.history[-1] if self.history else 'Nothing said. He did not talk with the player yet.'}\n\n Based on the user's response and the actual state of the conversation ({actual_state}), classify the user response into one of these intents: {', '.join(l)}: \n\nUSER_RESPONSE:{user_response}\n\n---\n\nGive only the state, no other information."
+        return self.character.payload("intent", prompt, self.model, user_response=user_response)
 
-        "Suspicion": """You are suspicious about the intentions of the customer. You are not so convinced to do business with them. If they persist in questioning the quality of your items, reassure them of the value of your goods. If they show signs of being convinced, offer them a chance to negotiate the prices. If they show no interest, gracefully acknowledge their decision and hint at the possibility of future encounters.""",
+    def apply_intent(self, intent):
+        """Follow the transition of the intent from the current state, if any. Return True if a transition was found."""
+        next_state = self.character.next_state(self.actual_state, intent)
+        if next_state is None:
+            return False
+        self.previous_state = self.actual_state
+        self.actual_state = next_state
+        return True
 
-        "Negotiation": """You offer your product at a price. If they accept your offer, proceed with the transaction. If they continue to negotiate further, engage with them and try to convince them of the value of the items. If their persistence wears thin, let them know that the offer stands for a limited time. If they are dissuasive, hint at the possibility of a better price.""",
+    def reply_payload(self, user_response, state=None):
+        """Build the request generating the response of the merchant in a state, the current one by default, continuing from the context when it is still valid."""
+        state = state or self.actual_state
+        if self.context is not None and state == self.context_state and self.context_turns < self.max_context_turns:
+            return self.character.payload("reply", f"The last message of the player was: {user_response}\n\n", self.model, context=self.context)
+        summary = f"Summary of the conversation so far: {self.summary}\n\n" if self.summary else ""
+        prompt = f"{self.character.state_prompts[state]}{summary}The last message of the player was: {user_response}\n\nYour last response was: {self.history[-1] if self.history else ''}\n\n"
+        return self.character.payload("reply", prompt, self.model)
 
-        "TrustBuilding": """You have established a connection with the customer, indicating a level of trust. It's time to finalize the deal, showing respect for their interests. If they agree to the deal and they had been very dissuasive, present a very little discount.""",
+    def context_keeper(self, payload, state):
+        """Return the on_done callback keeping the context of a reply generated with payload in state, to continue from it on the next turn."""
+        def keep(chunk):
+            if "context" in chunk:
+                self.context_turns = self.context_turns + 1 if "context" in payload else 1
+                self.context, self.context_state = chunk["context"], state
+        return keep
 
-        "Final Offer": """Confirm the item and the price to the customer to close the deal. If they accept the offer, celebrate the agreement. If they refuse or show no interest, gracefully acknowledge their decision and hint at the possibility of future encounters.""",
+    def add_reply(self, response):
+        """Append a reply to the history. Return the reply it drops, None if the history was not full."""
+        dropped = self.history[0] if len(self.history) == self.history.maxlen else None
+        self.history.append(response)
+        return dropped
 
-        "End": """You conclude the interaction with the customer. Offer a parting message that leaves the door open for future encounters. Provide a hint about your next destination. Bid them farewell with a touch of mystery."""
-        }
+    def summary_payload(self, dropped):
+        """Build the request folding a reply dropped from the history into the summary."""
+        prompt = f"Summary of a conversation between a merchant and a player: {self.summary or 'none yet'}\n\nAn older reply of the merchant: {dropped}\n\nUpdate the summary with this reply, in at most five sentences. Give only the summary."
+        return self.character.payload("summary", prompt, self.model)
 
-    def get_user_intent(self, user_response, actual_state, l):
+    def end_turn(self, response):
+        """Store the reply of the turn, summarizing the reply it drops from the history if summarize."""
+        dropped = self.add_reply(response)
+        if dropped is not None and self.summarize:
+            self.summary = "".join(self.client.generate_stream(self.summary_payload(dropped))).strip()
+
+    async def end_turn_async(self, response):
+        """Asyncio version of end_turn."""
+        dropped = self.add_reply(response)
+        if dropped is not None and self.summarize:
+            self.summary = "".join([token async for token in self.async_client.generate_stream(self.summary_payload(dropped))]).strip()
+
+    def reset(self):
+        """Start the conversation over."""
+        self.actual_state = self.character.initial_state
+        self.previous_state = None
+        self.history.clear()
+        self.summary = ""
+        self.context = None
+
+    def turn_payload(self, user_response, l):
+        """Build the structured request answering both the intent of the user response, one of those in l, and the reply of the merchant in the state it leads to."""
+        instructions = ""
+        for intent in l:
+            next_state = self.character.next_state(self.actual_state, intent)
+            if next_state is not None:
+                instructions += f"- {intent}: {self.character.prompts[next_state]}\n"
+        prompt = f"{self.character.system_prompt}\n\nYour last response was: {self.history[-1] if self.history else 'Nothing said. You did not talk with the player yet.'}\n\nThe last message of the player was: {user_response}\n\nFirst classify the message of the player into one of these intents, then reply to the player following the instructions of that intent:\n{instructions}\nAnswer in JSON with the fields intent and reply."
+        return self.character.payload("reply", prompt, self.model, format=turn_schema(l))
+
+    def ask_intent(self, user_response, actual_state, l):
         """Use LLM to classify user response into an intent for state transitions."""
-        print(l)
-        payload = {
-            "prompt": f"This is the last response of the merchant:\n\n MERCHANT: {self.history[-1] if self.history else 'Nothing said. He did not talk with the player yet.'}\n\n Based on the user's response and the actual state of the conversation ({actual_state}), classify the user response into one of these intents: {str(l).replace("'", "").replace("[", "").replace("]","")}: \n\nUSER_RESPONSE:{user_response}\n\n---\n\nGive only the state, no other information.",
-            "user_response": user_response,
-            "model": self.model,
-            "temperature": 1.0,
-        }
         intent = ""
-        for token in self.client.generate_stream(payload):
+        for token in self.client.generate_stream(self.intent_payload(user_response, actual_state, l)):
             intent += token
         return intent.strip()
 
+    def get_user_intent(self, user_response, actual_state, l):
+        """Classify user response into an intent for state transitions, asking the LLM only when the resolver cannot answer."""
+        print(l)
+        return self.resolver.resolve(actual_state, user_response, l, lambda: self.ask_intent(user_response, actual_state, l))
+
     def change_state(self, user_response):
         """Update the state based on user response interpreted as an intent."""
-        l = []
-        for transition in self.transitions:
-            if transition["from"] == self.actual_state:
-                l.append(transition["input"])
-        intent = self.get_user_intent(user_response, self.actual_state, l)
-        print(f"\nINTENT OF THE USER: {intent}")
-
-        next_state = self.actual_state
-        transitioned = False
-        for transition in self.transitions:
-            if transition["from"] == self.actual_state and transition["input"] == intent:
-                next_state = transition["to"]
-                transitioned = True
-                break
-
-        if next_state != self.actual_state or transitioned:
-            print(f"Transitioning from {self.actual_state} to {next_state}")
-            self.previous_state = self.actual_state
-            self.actual_state = next_state
+        actual_state, l = self.actual_state, self.legal_intents()
+        if self.structured:
+            print(l)
+            intent = self.resolver.resolve_local(actual_state, user_response, l)
+            if intent is None:
+                self.change_state_structured(user_response, l)
+                return
         else:
-            print("No valid transition found. Remaining in current state.")
+            intent = self.get_user_intent(user_response, actual_state, l)
+        self.report_transition(intent, actual_state)
         
         # now generate the response of the merchant based on the new state
-        prompt = f"{self.system_prompt}\n\n{self.prompts[self.actual_state]}\n\nThe last message of the player was: {user_response}\n\nYour last response was: {self.history[-1] if self.history else ''}\n\n"
-        payload = {"prompt": prompt, "model": self.model, "temperature": 0.9}
         response = ""
-        for token in self.client.generate_stream(payload):
+        payload = self.reply_payload(user_response)
+        for token in self.client.generate_stream(payload, on_done=self.context_keeper(payload, self.actual_state)):
             # count the number of tokens generated
             response += token
             print(token, end='', flush=True)
         print("\n")
         # Append the new response to the history
-        self.history.append(response)
+        self.end_turn(response)
+
+    def report_transition(self, intent, actual_state):
+        """Follow the transition of the intent and print it."""
+        print(f"\nINTENT OF THE USER: {intent}")
+        if self.apply_intent(intent):
+            print(f"Transitioning from {actual_state} to {self.actual_state}")
+        else:
+            print("No valid transition found. Remaining in current state.")
+
+    def change_state_structured(self, user_response, l):
+        """Play a turn with one structured request: the state changes as soon as the intent is parsed, then the reply is printed as it streams."""
+        actual_state = self.actual_state
+        parser = StructuredTurnParser()
+        intent = None
+        response = ""
+        for token in self.client.generate_stream(self.turn_payload(user_response, l)):
+            text = parser.feed(token)
+            if intent is None and (intent := parser.fields.get("intent")) is not None:
+                self.report_transition(intent, actual_state)
+            response += text
+            print(text, end='', flush=True)
+        self.resolver.learn(actual_state, user_response, l, intent)
+        if intent is None:
+            # no intent: keep the state, the reply is the streamed one, or the whole text if the server ignored the schema
+            self.report_transition(None, actual_state)
+            if response:
+                response = parser.fields.get("reply", response)
+            else:
+                response = parser.text
+                print(response, end='')
+        print("\n")
+        # the context of the structured request is not the one of a reply
+        self.context = None
+        self.end_turn(response)
+
+    async def ask_intent_async(self, user_response, actual_state, l):
+        """Asyncio version of ask_intent."""
+        intent = ""
+        async for token in self.async_client.generate_stream(self.intent_payload(user_response, actual_state, l)):
+            intent += token
+        return intent.strip()
+
+    async def get_user_intent_async(self, user_response, actual_state, l):
+        """Asyncio version of get_user_intent."""
+        return await self.resolver.resolve_async(actual_state, user_response, l, lambda: self.ask_intent_async(user_response, actual_state, l))
+
+    def candidate_states(self, user_response, l):
+        """Return the states the intents in l lead to, the most likely first according to the local scores of the resolver."""
+        scores = self.resolver.scores(user_response, l)
+        states = []
+        for intent in sorted(l, key=lambda intent: -scores.get(intent, 0.0)):
+            next_state = self.character.next_state(self.actual_state, intent)
+            if next_state is not None and next_state not in states:
+                states.append(next_state)
+        return states
+
+    async def start_speculation(self, user_response, l):
+        """
+        Start generating the replies of the likely next states, at most self.speculate and only while speculation slots are free.
+
+        Returns:
+            A dict mapping each candidate state to (queue of its tokens, then its last chunk, ended by None, task generating them, its payload).
+        """
+        speculations = {}
+        for state in self.candidate_states(user_response, l)[:self.speculate]:
+            slots = self.speculation_slots
+            if slots is not None:
+                if slots.locked():
+                    break
+                await slots.acquire()
+            queue = asyncio.Queue()
+            payload = self.reply_payload(user_response, state)
+            task = asyncio.ensure_future(self._speculate(payload, queue))
+            if slots is not None:
+                # a done callback also runs for a task cancelled before it started
+                task.add_done_callback(lambda _, slots=slots: slots.release())
+            speculations[state] = (queue, task, payload)
+            self.speculations_started += 1
+        return speculations
+
+    async def _speculate(self, payload, queue):
+        """Generate a reply into a queue: its tokens, then its last chunk, ended by None."""
+        try:
+            async for token in self.async_client.generate_stream(payload, on_done=queue.put_nowait):
+                queue.put_nowait(token)
+        finally:
+            queue.put_nowait(None)
+
+    @staticmethod
+    async def _replay(queue, task, on_done):
+        """Yield the tokens of a speculative reply, those already generated first, and pass its last chunk to on_done."""
+        try:
+            while (token := await queue.get()) is not None:
+                if isinstance(token, dict):
+                    on_done(token)
+                else:
+                    yield token
+            # raise the error of the stream, if any
+            await task
+        finally:
+            task.cancel()
+
+    @staticmethod
+    async def cancel_speculation(speculations):
+        """Cancel speculative replies, closing their connections."""
+        tasks = [task for _, task, _ in speculations.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def change_state_async(self, user_response, on_token=None):
+        """
+        Asyncio version of change_state, for NPCs serving many players at once (see sessions.SessionManager).
+        Nothing is printed: the tokens of the response are passed to on_token as they arrive and the whole response is returned.
+        In speculative mode, the replies of the likely next states are generated while the LLM classifies the intent.
+        In structured mode, one request answers both, see change_state_structured.
+        """
+        actual_state, l = self.actual_state, self.legal_intents()
+        if self.structured:
+            intent = self.resolver.resolve_local(actual_state, user_response, l)
+            if intent is None:
+                return await self.change_state_structured_async(user_response, l, on_token)
+            return await self._reply_async(user_response, intent, {}, on_token)
+        speculations = {}
+
+        async def ask():
+            # only reached when the cache and the local classifier cannot answer: the intent request is queued first
+            asking = asyncio.ensure_future(self.ask_intent_async(user_response, actual_state, l))
+            if self.speculate:
+                speculations.update(await self.start_speculation(user_response, l))
+            return await asking
+
+        try:
+            intent = await self.resolver.resolve_async(actual_state, user_response, l, ask)
+        except BaseException:
+            await self.cancel_speculation(speculations)
+            raise
+        return await self._reply_async(user_response, intent, speculations, on_token)
+
+    async def _reply_async(self, user_response, intent, speculations, on_token):
+        """Follow the transition of the intent, then stream the reply of the new state, reusing its speculative reply if any."""
+        self.apply_intent(intent)
+        winner = speculations.pop(self.actual_state, None)
+        await self.cancel_speculation(speculations)
+        if winner is not None:
+            self.speculations_used += 1
+            queue, task, payload = winner
+            stream = self._replay(queue, task, self.context_keeper(payload, self.actual_state))
+        else:
+            payload = self.reply_payload(user_response)
+            stream = self.async_client.generate_stream(payload, on_done=self.context_keeper(payload, self.actual_state))
+        response = ""
+        async for token in stream:
+            response += token
+            if on_token is not None:
+                on_token(token)
+        await self.end_turn_async(response)
+        return response
+
+    async def change_state_structured_async(self, user_response, l, on_token=None):
+        """Asyncio version of change_state_structured, the reply is passed to on_token as it streams and returned."""
+        actual_state = self.actual_state
+        parser = StructuredTurnParser()
+        intent = None
+        response = ""
+        async for token in self.async_client.generate_stream(self.turn_payload(user_response, l)):
+            text = parser.feed(token)
+            if intent is None and (intent := parser.fields.get("intent")) is not None:
+                self.apply_intent(intent)
+            if text:
+                response += text
+                if on_token is not None:
+                    on_token(text)
+        self.resolver.learn(actual_state, user_response, l, intent)
+        if intent is None:
+            # no intent: keep the state, the reply is the streamed one, or the whole text if the server ignored the schema
+            if response:
+                response = parser.fields.get("reply", response)
+            else:
+                response = parser.text
+                if on_token is not None:
+                    on_token(response)
+        self.context = None
+        await self.end_turn_async(response)
+        return response
 
     def interact(self):
         """Main interaction loop with the user."""
@@ -144,15 +346,14 @@ class MerchantDFA:
             if self.actual_state == "End":
                 x = input("Do you want to continue (yes/no)? ")
                 if x.lower() == "yes":
-                    self.actual_state = "Introduction"
-                    self.previous_state = None
-                    self.history = []
+                    self.reset()
                 else:
                     break
 # Esempio d'uso
 if __name__ == "__main__":
-    # start the llm just to don't load at the first interaction
-    
     print("=== Merchant ===")
-    npc = MerchantDFA(model="llama3.2")
+    npc = MerchantDFA()
+    # start the llm just to don't load at the first interaction
+    npc.client.warm_up(npc.model)
     npc.interact()
+    print(npc.resolver.metrics())
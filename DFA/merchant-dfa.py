@@ -1,59 +1,16 @@
 import requests
-import json
-from typing import Generator, Optional
-import sys
-
-class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        """Initialize Ollama client with base URL."""
-        self.base_url = base_url.rstrip('/')
-        
-    def generate_stream(
-        self,
-        payload: dict,
-    ) -> Generator[str, None, None]:
-        """
-        Generate streaming response from Ollama.
-        
-        Args:
-            payload (dict): The request payload to send to Ollama.
-            
-        Yields:
-            Stream of tokens from the response
-        """
-        url = f"{self.base_url}/api/generate"
-        
-        # Prepare the request payload
-        
-        try:
-            # Make streaming request
-            with requests.post(url, json=payload, stream=True) as response:
-                response.raise_for_status()
-                
-                # Process the stream
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        if 'error' in chunk:
-                            raise Exception(chunk['error'])
-                        
-                        if 'response' in chunk:
-                            yield chunk['response']
-                            
-                        # Check if done
-                        if chunk.get('done', False):
-                            break
-                            
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to communicate with Ollama: {str(e)}")
+from typing import Optional
+from ollama import OllamaClient
 
 class MerchantDFA:
-    def __init__(self, model="llama3.2"):
+    def __init__(self, model="llama3.2", client: Optional[OllamaClient] = None):
         # Initial state
         self.previous_state = None
         self.actual_state = "Introduction"
         self.model = model
         self.api_base = "http://localhost:11434"
+        # a shared client reuses its pooled connections
+        self.client = client or OllamaClient(self.api_base)
         
         # System prompt that defines the character and behavior
         self.system_prompt = """You are a mysterious traveling merchant named Gideon in a fantasy world. You sell rare and valuable items but like to test your customers, initially offering items at high prices. Depending on the player’s responses, you may adjust your prices or reveal more information about your goods. You interact with the player through six main states:
@@ -131,7 +88,6 @@ class MerchantDFA:
     def generate_llm_response(self, current_prompt):
         """Generates a response from Ollama based on the current state."""
         # Combine system prompt with state-specific prompt
-        client = OllamaClient()
         message = ""
         try:
             payload = {
@@ -142,7 +98,7 @@ class MerchantDFA:
                 "max_tokens": 75,
                 "system": self.system_prompt,
             }
-            for token in client.generate_stream(payload):
+            for token in self.client.generate_stream(payload):
                 # count the number of tokens generated
                 print(token, end='', flush=True)
                 message += token
@@ -182,6 +138,8 @@ if __name__ == "__main__":
     
     # Create the bounty hunter NPC
     npc = MerchantDFA(model="llama3.2")
+    # load the model before the first turn
+    npc.client.warm_up(npc.model)
     
     # Simulate a complete mission cycle
     states = [
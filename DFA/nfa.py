@@ -0,0 +1,519 @@
+import json
+import os
+from collections import deque
+from product import StateLimitExceeded
+
+# epsilon moves are written with an empty or null input in NFA JSON files
+EPSILON = (None, "")
+DIGITS = "0123456789"
+WORD = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_"
+SPACE = " \t\n\r\f\v"
+
+class NFA:
+    '''
+    A Nondeterministic Finite Automaton with epsilon moves, built from a JSON definition or a regular expression.
+    It is not run directly: to_dfa builds the equivalent DFA by subset construction, lazy builds it on demand.
+
+    Attributes:
+    - state_names (list): The states indexed by their integer id.
+    - alphabet (list): The input symbols.
+    - moves (list): For each state id, a dictionary from each symbol to the list of the next state ids.
+    - epsilon (list): For each state id, the list of the state ids reached by an epsilon move.
+    - initial_id (int): The id of the initial state.
+    - accepting (set): The ids of the accepting states.
+
+    Methods:
+    - from_dict(json_data: dict) -> NFA: Constructs an NFA from a JSON definition.
+    - from_file(file_path: str) -> NFA: Constructs an NFA from a JSON file.
+    - from_regex(pattern: str, alphabet: list = None) -> NFA: Constructs an NFA matching a regular expression (Thompson construction).
+    - closure(states) -> frozenset: Returns the states reachable with epsilon moves.
+    - step(states: frozenset, symbol) -> frozenset: Returns the closure of the states reached with a symbol.
+    - to_dfa(max_states: int = None) -> DFA: Builds the equivalent DFA by subset construction.
+    - lazy(max_states: int = 10000) -> LazyDFA: Returns the equivalent DFA, built on demand with a bounded cache.
+    '''
+    def __init__(self, state_names: list, alphabet: list, initial_id: int, accepting: set):
+        '''
+        Constructs an NFA without moves, see add_move and add_epsilon.
+
+        Args:
+        - state_names (list): The states indexed by their integer id.
+        - alphabet (list): The input symbols.
+        - initial_id (int): The id of the initial state.
+        - accepting (set): The ids of the accepting states.
+        '''
+        self.state_names = list(state_names)
+        self.alphabet = list(alphabet)
+        self.moves = [{} for _ in self.state_names]
+        self.epsilon = [[] for _ in self.state_names]
+        self.initial_id = initial_id
+        self.accepting = set(accepting)
+        self._closures = {}
+
+    def add_move(self, from_id: int, symbol, to_id: int):
+        '''
+        Adds a move on a symbol.
+        '''
+        self.moves[from_id].setdefault(symbol, []).append(to_id)
+
+    def add_epsilon(self, from_id: int, to_id: int):
+        '''
+        Adds an epsilon move.
+        '''
+        self.epsilon[from_id].append(to_id)
+
+    @classmethod
+    def from_dict(cls, json_data: dict) -> "NFA":
+        '''
+        Constructs an NFA from a JSON definition in the schema of the DFA files.
+        A (state, input) pair may have several transitions, a null or empty input is an epsilon move and "to" may be a list of states.
+
+        Args:
+        - json_data (dict): A dictionary containing the NFA definition.
+
+        Returns:
+        - NFA: The new NFA.
+        '''
+        required_keys = ["states", "alphabet", "initialState", "acceptStates", "transitions"]
+        missing_keys = [key for key in required_keys if key not in json_data]
+        if missing_keys:
+            raise ValueError(f"Error: missing keys in JSON file: {missing_keys}")
+        index = {state: i for i, state in enumerate(json_data["states"])}
+        alphabet = set(json_data["alphabet"])
+        for state in [json_data["initialState"], *json_data["acceptStates"]]:
+            if state not in index:
+                raise ValueError(f"Error: unknown state {state!r}")
+        nfa = cls(json_data["states"], json_data["alphabet"], index[json_data["initialState"]], {index[state] for state in json_data["acceptStates"]})
+        for transition in json_data["transitions"]:
+            input_symbol = transition.get("input")
+            targets = transition["to"] if isinstance(transition["to"], list) else [transition["to"]]
+            for state in [transition["from"], *targets]:
+                if state not in index:
+                    raise ValueError(f"Error: unknown state {state!r}")
+            if input_symbol not in EPSILON and input_symbol not in alphabet:
+                raise ValueError(f"Error: unknown symbol {input_symbol!r}")
+            for to_state in targets:
+                if input_symbol in EPSILON:
+                    nfa.add_epsilon(index[transition["from"]], index[to_state])
+                else:
+                    nfa.add_move(index[transition["from"]], input_symbol, index[to_state])
+        return nfa
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "NFA":
+        '''
+        Constructs an NFA from a JSON file, see from_dict.
+
+        Args:
+        - file_path (str): The path to the JSON file containing the NFA definition.
+
+        Returns:
+        - NFA: The new NFA.
+        '''
+        if not file_path.endswith(".json"):
+            raise ValueError("Error: file must be a JSON file")
+        if not os.path.exists(file_path):
+            raise FileNotFoundError("Error: file not found")
+        with open(file_path) as f:
+            try:
+                json_data = json.load(f)
+            except ValueError:
+                raise ValueError("Error: file not valid, ensure it is a valid JSON file")
+        return cls.from_dict(json_data)
+
+    @classmethod
+    def from_regex(cls, pattern: str, alphabet: list = None) -> "NFA":
+        '''
+        Constructs an NFA accepting exactly the strings matched (as a whole) by a regular expression, by Thompson construction.
+        Supported syntax: literals, ".", "|", "*", "+", "?", groups "(...)", classes "[abc]", "[a-z]", "[^...]", the escapes "\\d", "\\w", "\\s" and "\\" before a metacharacter.
+
+        Args:
+        - pattern (str): The regular expression.
+        - alphabet (list): The single-character symbols of the automaton, "." and negated classes match any of them. If None, the characters of the pattern.
+
+        Returns:
+        - NFA: The new NFA.
+        '''
+        return _RegexParser(pattern, alphabet).parse()
+
+    def closure(self, states) -> frozenset:
+        '''
+        Returns the states reachable from some states with epsilon moves only, the states included.
+
+        Args:
+        - states (iterable): The state ids.
+
+        Returns:
+        - frozenset: The epsilon closure.
+        '''
+        result = set(states)
+        stack = list(result)
+        while stack:
+            for next_state in self.epsilon[stack.pop()]:
+                if next_state not in result:
+                    result.add(next_state)
+                    stack.append(next_state)
+        return frozenset(result)
+
+    def step(self, states: frozenset, symbol) -> frozenset:
+        '''
+        Returns the epsilon closure of the states reached from some states with a symbol.
+
+        Args:
+        - states (frozenset): A closed set of state ids.
+        - symbol: The input symbol.
+
+        Returns:
+        - frozenset: The next closed set of state ids, empty if no move is defined.
+        '''
+        moves = self.moves
+        targets = set()
+        for state in states:
+            targets.update(moves[state].get(symbol, ()))
+        if not targets:
+            return frozenset()
+        key = frozenset(targets)
+        closure = self._closures.get(key)
+        if closure is None:
+            closure = self._closures[key] = self.closure(key)
+        return closure
+
+    def _name(self, states: frozenset) -> str:
+        '''
+        Returns the name of the DFA state standing for a set of NFA states.
+        '''
+        return "{" + ",".join(str(self.state_names[state]) for state in sorted(states)) + "}"
+
+    def to_dfa(self, max_states: int = None):
+        '''
+        Builds the equivalent DFA by eager subset construction: every reachable set of NFA states becomes a DFA state.
+        The empty set is not a state, the symbols with no move lead to the dead state.
+
+        Args:
+        - max_states (int): The largest number of DFA states, None for no limit. Patterns such as (a|b)*a(a|b){n} need 2^n states, building more raises StateLimitExceeded.
+
+        Returns:
+        - DFA: The equivalent DFA, each state is named after its set of NFA states.
+        '''
+        from DFA import DFA
+        initial = self.closure([self.initial_id])
+        seen, queue, transitions = {initial}, deque([initial]), []
+        while queue:
+            states = queue.popleft()
+            for symbol in self.alphabet:
+                next_states = self.step(states, symbol)
+                if not next_states:
+                    continue
+                if next_states not in seen:
+                    if max_states is not None and len(seen) >= max_states:
+                        raise StateLimitExceeded(f"Error: subset construction exceeds {max_states} states, use lazy instead")
+                    seen.add(next_states)
+                    queue.append(next_states)
+                transitions.append({"from": self._name(states), "to": self._name(next_states), "input": symbol})
+        ordered = sorted(seen, key=lambda states: (states != initial, sorted(states)))
+        return DFA.from_dict({
+            "states": [self._name(states) for states in ordered],
+            "alphabet": list(self.alphabet),
+            "transitions": transitions,
+            "initialState": self._name(initial),
+            "acceptStates": [self._name(states) for states in ordered if states & self.accepting],
+        })
+
+    def lazy(self, max_states: int = 10000) -> "LazyDFA":
+        '''
+        Returns the equivalent DFA, with states built on demand while running.
+
+        Args:
+        - max_states (int): The largest number of DFA states kept in the cache.
+
+        Returns:
+        - LazyDFA: The lazy DFA.
+        '''
+        return LazyDFA(self, max_states)
+
+class LazyDFA:
+    '''
+    The DFA of an NFA built on demand, one state (set of NFA states) and one transition at a time, as in RE2.
+    Running a string costs one table lookup per symbol once its states are cached, and at most one NFA step per symbol otherwise, so matching stays linear in the input even when the full DFA would be exponential.
+    When the cache holds max_states states it is flushed, only the state being run is kept.
+
+    Attributes:
+    - nfa (NFA): The NFA.
+    - symbols (list): The alphabet, indexed by symbol id.
+    - symbol_index (dict): Mapping from each symbol to its id.
+    - max_states (int): The largest number of DFA states kept in the cache.
+    - misses (int): The number of transitions computed on the NFA, every other transition is read from the cache.
+    - flushes (int): The number of times the cache was emptied.
+
+    Methods:
+    - run(input_string) -> bool: Processes an input string and returns True if it is accepted.
+    - bulk_run(input_strings: list) -> list: Processes a list of input strings and returns a list of results.
+    '''
+    def __init__(self, nfa: NFA, max_states: int = 10000):
+        '''
+        Constructs a new lazy DFA, only the initial state is built.
+
+        Args:
+        - nfa (NFA): The NFA.
+        - max_states (int): The largest number of DFA states kept in the cache, at least 2.
+        '''
+        if max_states < 2:
+            raise ValueError("Error: max_states must be at least 2")
+        self.nfa = nfa
+        self.symbols = list(nfa.alphabet)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.max_states = max_states
+        self.misses = self.flushes = 0
+        self._initial = nfa.closure([nfa.initial_id])
+        self._flush()
+
+    def __len__(self) -> int:
+        '''
+        Returns the number of DFA states in the cache.
+        '''
+        return len(self._keys)
+
+    def _flush(self):
+        '''
+        Empties the cache, the dead state (the empty set) and the initial state always get ids 0 and 1.
+        '''
+        # the closures memoized by the NFA would grow without bound too
+        self.nfa._closures.clear()
+        self._index = {}
+        self._keys = []
+        self._accepting = []
+        # next state id of (state, symbol), -1 until it is needed
+        self._delta = []
+        self._intern(frozenset())
+        self.initial_id = self._intern(self._initial)
+
+    def _intern(self, states: frozenset) -> int:
+        '''
+        Returns the id of a DFA state, creating it on first sight.
+
+        Args:
+        - states (frozenset): The closed set of NFA states.
+
+        Returns:
+        - int: The id of the DFA state.
+        '''
+        sid = self._index.get(states)
+        if sid is None:
+            sid = self._index[states] = len(self._keys)
+            self._keys.append(states)
+            self._accepting.append(not self.nfa.accepting.isdisjoint(states))
+            # the dead state only leads to itself
+            self._delta.extend([0 if sid == 0 else -1] * len(self.symbols))
+        return sid
+
+    def _next(self, sid: int, symbol: int) -> int:
+        '''
+        Returns the DFA state reached with a symbol, computing it on the NFA on a cache miss.
+        The cache is flushed first when it is full, the returned id is valid in the new cache.
+
+        Args:
+        - sid (int): The id of the DFA state.
+        - symbol (int): The symbol id.
+
+        Returns:
+        - int: The id of the next DFA state.
+        '''
+        i = sid * len(self.symbols) + symbol
+        next_id = self._delta[i]
+        if next_id >= 0:
+            return next_id
+        self.misses += 1
+        states = self._keys[sid]
+        next_states = self.nfa.step(states, self.symbols[symbol])
+        if next_states not in self._index and len(self._keys) >= self.max_states:
+            self.flushes += 1
+            self._flush()
+            sid = self._intern(states)
+            i = sid * len(self.symbols) + symbol
+        next_id = self._delta[i] = self._intern(next_states)
+        return next_id
+
+    def run(self, input_string) -> bool:
+        '''
+        Processes an input string and returns True if it is accepted.
+
+        Args:
+        - input_string (str or sequence): The input string, or sequence of symbols, to be processed.
+
+        Returns:
+        - bool: True if the input string is accepted, False otherwise.
+        '''
+        symbol_index, delta, width = self.symbol_index, self._delta, len(self.symbols)
+        state = self.initial_id
+        for s in input_string:
+            symbol = symbol_index.get(s)
+            # unrecognized symbol
+            if symbol is None:
+                return False
+            next_id = delta[state * width + symbol]
+            if next_id < 0:
+                next_id = self._next(state, symbol)
+                # the cache may have been flushed
+                delta = self._delta
+            state = next_id
+            # no NFA state left, the string is rejected
+            if state == 0:
+                return False
+        return self._accepting[state]
+
+    def bulk_run(self, input_strings: list) -> list:
+        '''
+        Runs a list of input strings through the lazy DFA and returns a list of results.
+
+        Args:
+        - input_strings (list): A list of input strings to be processed.
+
+        Returns:
+        - list: A list of tuples containing the input strings and their corresponding results (True if accepted, False otherwise).
+        '''
+        run = self.run
+        return [(input_string, run(input_string)) for input_string in input_strings]
+
+class _RegexParser:
+    '''
+    Recursive descent parser of regular expressions, building the NFA fragments of the Thompson construction.
+    A fragment is the pair of its start and end state ids, the end state has no move yet.
+    '''
+    def __init__(self, pattern: str, alphabet: list = None):
+        self.pattern = pattern
+        self.pos = 0
+        self.alphabet = None if alphabet is None else list(alphabet)
+        if self.alphabet is not None and not all(isinstance(symbol, str) and len(symbol) == 1 for symbol in self.alphabet):
+            raise ValueError("Error: regular expressions need single-character symbols")
+        self.nfa = NFA([], self.alphabet or [], 0, set())
+        self.used = set()
+
+    def _state(self) -> int:
+        nfa = self.nfa
+        nfa.state_names.append(len(nfa.state_names))
+        nfa.moves.append({})
+        nfa.epsilon.append([])
+        return len(nfa.state_names) - 1
+
+    def _error(self, message: str):
+        raise ValueError(f"Error: {message} at position {self.pos} of regular expression {self.pattern!r}")
+
+    def _peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def parse(self) -> NFA:
+        start, end = self._alternation()
+        if self.pos < len(self.pattern):
+            self._error("unbalanced ')'")
+        nfa = self.nfa
+        nfa.initial_id, nfa.accepting = start, {end}
+        if self.alphabet is None:
+            nfa.alphabet = sorted(self.used)
+        return nfa
+
+    def _alternation(self) -> tuple:
+        branches = [self._concatenation()]
+        while self._peek() == "|":
+            self.pos += 1
+            branches.append(self._concatenation())
+        if len(branches) == 1:
+            return branches[0]
+        start, end = self._state(), self._state()
+        for branch_start, branch_end in branches:
+            self.nfa.add_epsilon(start, branch_start)
+            self.nfa.add_epsilon(branch_end, end)
+        return start, end
+
+    def _concatenation(self) -> tuple:
+        fragments = []
+        while self._peek() not in (None, "|", ")"):
+            fragments.append(self._repetition())
+        if not fragments:
+            state = self._state()
+            return state, state
+        for (_, end), (start, _) in zip(fragments, fragments[1:]):
+            self.nfa.add_epsilon(end, start)
+        return fragments[0][0], fragments[-1][1]
+
+    def _repetition(self) -> tuple:
+        start, end = self._atom()
+        while self._peek() in ("*", "+", "?"):
+            operator = self.pattern[self.pos]
+            self.pos += 1
+            new_start, new_end = self._state(), self._state()
+            self.nfa.add_epsilon(new_start, start)
+            self.nfa.add_epsilon(end, new_end)
+            if operator in ("*", "?"):
+                self.nfa.add_epsilon(new_start, new_end)
+            if operator in ("*", "+"):
+                self.nfa.add_epsilon(end, start)
+            start, end = new_start, new_end
+        return start, end
+
+    def _atom(self) -> tuple:
+        c = self._peek()
+        if c in ("*", "+", "?"):
+            self._error(f"nothing to repeat before {c!r}")
+        self.pos += 1
+        if c == "(":
+            fragment = self._alternation()
+            if self._peek() != ")":
+                self._error("missing ')'")
+            self.pos += 1
+            return fragment
+        if c == "[":
+            symbols = self._class()
+        elif c == ".":
+            symbols = self._any()
+        elif c == "\\":
+            symbols = self._escape()
+        else:
+            symbols = {c}
+        return self._symbols(symbols)
+
+    def _symbols(self, symbols: set) -> tuple:
+        start, end = self._state(), self._state()
+        if self.alphabet is not None:
+            symbols = symbols & set(self.alphabet)
+        self.used.update(symbols)
+        for symbol in symbols:
+            self.nfa.add_move(start, symbol, end)
+        return start, end
+
+    def _any(self) -> set:
+        if self.alphabet is None:
+            self._error("'.' and negated classes need an alphabet")
+        return set(self.alphabet)
+
+    def _escape(self) -> set:
+        c = self._peek()
+        if c is None:
+            self._error("trailing '\\'")
+        self.pos += 1
+        return {"d": set(DIGITS), "w": set(WORD), "s": set(SPACE), "n": {"\n"}, "t": {"\t"}}.get(c, {c})
+
+    def _class(self) -> set:
+        negated = self._peek() == "^"
+        if negated:
+            self.pos += 1
+        symbols = set()
+        first = True
+        while True:
+            c = self._peek()
+            if c is None:
+                self._error("missing ']'")
+            self.pos += 1
+            if c == "]" and not first:
+                break
+            first = False
+            if c == "\\":
+                symbols |= self._escape()
+                continue
+            if self._peek() == "-" and self.pos + 1 < len(self.pattern) and self.pattern[self.pos + 1] != "]":
+                last = self.pattern[self.pos + 1]
+                self.pos += 2
+                if ord(last) < ord(c):
+                    self._error(f"bad range {c}-{last}")
+                symbols.update(chr(point) for point in range(ord(c), ord(last) + 1))
+            else:
+                symbols.add(c)
+        return self._any() - symbols if negated else symbols
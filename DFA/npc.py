@@ -0,0 +1,107 @@
+import os
+import json
+from types import MappingProxyType
+from collections.abc import Mapping
+from DFA import DFA
+
+# the directory of the character definitions shipped with the NPCs
+CHARACTERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _freeze(value):
+    """Return a read-only copy of a JSON value: mappings become MappingProxyType and lists tuples, at every depth."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value):
+    """Return a plain copy of a frozen value, that a request can own and serialize."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+class Character:
+    def __init__(self, file_path: str):
+        """
+        Compile the definition of an NPC character from a JSON file: its FSM, loaded with the DFA loader, and the "npc" section,
+        holding the model, the request parameters, the system prompt, the prompt of each state and the example phrases of each intent.
+
+        Everything a turn needs is precomputed once: the legal intents of each state with their targets, the legal next states,
+        and the system and state prompts joined into one prefix per state.
+        A Character is immutable, so one instance is shared by every session of the character, see load_character.
+
+        Args:
+            file_path (str): The path of the JSON file.
+        """
+        with open(file_path, encoding="utf-8") as f:
+            json_data = json.load(f)
+        dfa = DFA.from_dict(json_data, file_path)
+        npc = json_data.get("npc", {})
+        init = super().__setattr__
+        init("file_path", file_path)
+        init("dfa", dfa)
+        init("initial_state", dfa.initial_state)
+        init("model", npc.get("model", "llama3.2"))
+        # request parameters by kind of request, e.g. {"reply": {"temperature": 0.9, "options": {"num_predict": 75}}}
+        init("parameters", _freeze(npc.get("parameters", {})))
+        init("system_prompt", npc.get("systemPrompt", ""))
+        init("prompts", MappingProxyType(dict(npc.get("prompts", {}))))
+        init("intent_examples", MappingProxyType({intent: tuple(phrases) for intent, phrases in npc.get("intentExamples", {}).items()}))
+        init("next_state_marker", npc.get("nextStateMarker", "Next State:"))
+
+        # the transitions of each state, in the order of the file
+        targets = {state: {} for state in dfa.states}
+        for (from_state, intent), to_state in dfa.transitions.items():
+            targets.setdefault(from_state, {})[intent] = to_state
+        init("targets", MappingProxyType({state: MappingProxyType(table) for state, table in targets.items()}))
+        init("intents", MappingProxyType({state: tuple(table) for state, table in targets.items()}))
+        init("next_states", MappingProxyType({state: tuple(dict.fromkeys(table.values())) for state, table in targets.items()}))
+        init("state_prompts", MappingProxyType({state: f"{self.system_prompt}\n\n{prompt}\n\n" for state, prompt in self.prompts.items()}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Character is immutable, cannot set '{name}'")
+
+    def next_state(self, state: str, intent: str):
+        """Return the state the intent leads to from a state, None if there is no such transition."""
+        table = self.targets.get(state)
+        return None if table is None else table.get(intent)
+
+    def payload(self, kind: str, prompt: str, model: str = None, **fields) -> dict:
+        """
+        Build a request with the parameters of a kind of request.
+
+        Args:
+            kind (str): The kind of request, e.g. "intent" or "reply", a key of the "parameters" of the definition.
+            prompt (str): The prompt.
+            model (str): The model, the one of the definition if None.
+            fields: Other fields of the request, e.g. context or format.
+
+        Returns:
+            The request payload, owning copies of the nested parameters, e.g. options.
+        """
+        return {"prompt": prompt, "model": model or self.model, **_thaw(self.parameters.get(kind, {})), **fields}
+
+# the compiled characters by real path, with the modification time of their file
+_characters = {}
+
+def load_character(file_path: str) -> Character:
+    """
+    Return the compiled character of a JSON file, shared by every caller. The file is compiled again only when it changes.
+
+    Args:
+        file_path (str): The path of the JSON file, relative paths are looked up next to this module.
+
+    Returns:
+        The character.
+    """
+    if not os.path.isabs(file_path) and not os.path.exists(file_path):
+        file_path = os.path.join(CHARACTERS_DIR, file_path)
+    path = os.path.realpath(file_path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _characters.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        cached = _characters[path] = (mtime_ns, Character(path))
+    return cached[1]
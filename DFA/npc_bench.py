@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+import contextlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from ollama import OllamaClient, AsyncOllamaClient
+from mdfa import MerchantDFA
+from sessions import SessionManager
+from fake_ollama import FakeOllama
+
+# what the players say, in turn: some utterances are answered by the local classifier, the others go to the LLM
+UTTERANCES = ["Hello there!", "What do you have for sale?", "Hmm, I am not sure about any of this", "That's too expensive", "Deal!", "I accept"]
+SCENARIOS = ("merchant_sync", "merchant_async", "bounty_hunter")
+
+def _bounty_hunter_class():
+    '''
+    Returns the BountyHunterDFA class, its module name is not a valid identifier.
+    '''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bounty-hunter-dfa.py")
+    spec = importlib.util.spec_from_file_location("bounty_hunter_dfa", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.BountyHunterDFA
+
+def percentile(values: list, q: float) -> float:
+    '''
+    Returns the q-th percentile of values, by the nearest-rank method.
+    '''
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))] if ordered else 0.0
+
+def _turns_sync(npc, turns: int, play) -> tuple:
+    '''
+    Plays turns with a synchronous NPC. Returns the latency of each turn and the number of failed turns.
+    '''
+    latencies, errors = [], 0
+    for i in range(turns):
+        start = time.perf_counter()
+        try:
+            play(npc, i)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+def _play_merchant(npc, i: int):
+    npc.change_state(UTTERANCES[i % len(UTTERANCES)])
+    if npc.actual_state == "End":
+        npc.reset()
+
+def _play_bounty_hunter(npc, i: int):
+    npc.change_state()
+
+def run_sync(scenario: str, url: str, concurrency: int, turns: int) -> tuple:
+    '''
+    Runs synchronous NPCs, one per thread, sharing one pooled OllamaClient. Their output is discarded.
+
+    Returns:
+    - tuple: The latencies of all the turns, the number of failed turns and the wall time.
+    '''
+    client = OllamaClient(url, pool_size=concurrency)
+    if scenario == "bounty_hunter":
+        npc_class, play = _bounty_hunter_class(), _play_bounty_hunter
+    else:
+        npc_class, play = MerchantDFA, _play_merchant
+    npcs = [npc_class(client=client) for _ in range(concurrency)]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda npc: _turns_sync(npc, turns, play), npcs))
+        wall = time.perf_counter() - start
+    client.close()
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results), wall
+
+def run_async(url: str, concurrency: int, turns: int) -> tuple:
+    '''
+    Runs merchants in a SessionManager, one player per concurrent task, all sharing one AsyncOllamaClient.
+
+    Returns:
+    - tuple: The latencies of all the turns, the number of failed turns and the wall time.
+    '''
+    async def player(manager, player_id):
+        latencies, errors = [], 0
+        for i in range(turns):
+            start = time.perf_counter()
+            try:
+                await manager.turn(player_id, UTTERANCES[i % len(UTTERANCES)])
+                if manager.session(player_id).actual_state == "End":
+                    manager.session(player_id).reset()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    async def main():
+        manager = SessionManager(client=AsyncOllamaClient(url, pool_size=concurrency))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(player(manager, player_id) for player_id in range(concurrency)))
+        wall = time.perf_counter() - start
+        await manager.close()
+        return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results), wall
+
+    return asyncio.run(main())
+
+def bench_scenario(fake: FakeOllama, scenario: str, concurrency: int, turns: int) -> dict:
+    '''
+    Benchmarks one scenario at one concurrency level against the fake server.
+    The client overhead is the time of the turns beyond what the server needed to stream them (its ttft and token rate), spread over the tokens.
+
+    Args:
+    - fake (FakeOllama): The running fake server.
+    - scenario (str): One of SCENARIOS.
+    - concurrency (int): The number of NPCs playing at the same time.
+    - turns (int): The number of turns played by each NPC.
+
+    Returns:
+    - dict: The metrics, keyed "<scenario>/c<concurrency>/<metric>".
+    '''
+    fake.reset_stats()
+    if scenario == "merchant_async":
+        latencies, errors, wall = run_async(fake.url, concurrency, turns)
+    else:
+        latencies, errors, wall = run_sync(scenario, fake.url, concurrency, turns)
+    overhead = max(sum(latencies) - fake.ideal_seconds, 0.0)
+    results = {
+        "turns_per_s": len(latencies) / wall,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_turn": fake.requests / len(latencies),
+        "tokens_per_turn": fake.tokens / len(latencies),
+        "overhead_per_token_us": overhead / fake.tokens * 1e6 if fake.tokens else 0.0,
+        "errors": errors,
+    }
+    return {f"{scenario}/c{concurrency}/{metric}": value for metric, value in results.items()}
+
+def run_benchmarks(scenarios: tuple = SCENARIOS, concurrency: tuple = (1, 4, 16), turns: int = 30, token_rate: float = None, ttft: float = 0.0,
+                   reply_tokens: int = 20, error_rate: float = 0.0) -> dict:
+    '''
+    Runs every scenario at every concurrency level against a fake server started for the purpose.
+
+    Args:
+    - scenarios (tuple): The scenarios, see SCENARIOS.
+    - concurrency (tuple): The concurrency levels.
+    - turns (int): The number of turns played by each NPC.
+    - token_rate (float): Tokens per second of the fake server, None for unlimited, to measure the client alone.
+    - ttft (float): Seconds before the first token of each request.
+    - reply_tokens (int): The number of tokens of each reply.
+    - error_rate (float): The probability of a failed request.
+
+    Returns:
+    - dict: The environment, the settings and the metrics.
+    '''
+    metrics = {}
+    with FakeOllama(token_rate=token_rate, ttft=ttft, reply_tokens=reply_tokens, error_rate=error_rate) as fake:
+        for scenario in scenarios:
+            for level in concurrency:
+                metrics.update(bench_scenario(fake, scenario, level, turns))
+    settings = {"turns": turns, "token_rate": token_rate, "ttft": ttft, "reply_tokens": reply_tokens, "error_rate": error_rate}
+    return {"python": platform.python_version(), "machine": platform.machine(), "settings": settings, "metrics": metrics}
+
+# Usage: python npc_bench.py [--scenario merchant_async] [--concurrency 1 4 16] [--turns 30] [--token-rate 50] [--ttft 0.2] [--output npc_bench.json]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the NPC turn loop end to end against a fake Ollama server.")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="scenario to run, all by default")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="numbers of NPCs playing at the same time")
+    parser.add_argument("--turns", type=int, default=30, help="turns played by each NPC")
+    parser.add_argument("--token-rate", type=float, default=None, help="tokens per second of the fake server, unlimited by default")
+    parser.add_argument("--ttft", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--reply-tokens", type=int, default=20, help="tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a failed request")
+    parser.add_argument("--output", default=None, help="file the results are written to")
+    args = parser.parse_args()
+
+    results = run_benchmarks(tuple(args.scenario or SCENARIOS), tuple(args.concurrency), args.turns, args.token_rate, args.ttft, args.reply_tokens, args.error_rate)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    for metric, value in results["metrics"].items():
+        print(f"{metric:<50} {value:>16,.3f}")
@@ -0,0 +1,272 @@
+import requests
+import json
+import time
+import asyncio
+import urllib.parse
+from typing import AsyncGenerator, Callable, Generator, Optional
+from requests.adapters import HTTPAdapter
+
+class OllamaClient:
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 10, connect_timeout: float = 3.05, read_timeout: float = 120.0, keep_alive: str = "30m"):
+        """
+        Initialize Ollama client with base URL.
+
+        All the requests of a client go through one requests.Session, so TCP connections are pooled and reused between calls.
+        Create the client once and share it, e.g. between all the NPCs of a process.
+
+        Args:
+            base_url (str): The URL of the Ollama server.
+            pool_size (int): The largest number of connections kept open to the server.
+            connect_timeout (float): Seconds to wait for a connection.
+            read_timeout (float): Seconds to wait between two chunks of the response.
+            keep_alive (str): How long the server keeps the model loaded after a request, sent with every request that does not set it.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate_stream(self, payload: dict, on_done: Optional[Callable[[dict], None]] = None) -> Generator[str, None, None]:
+        """
+        Generate streaming response from Ollama.
+
+        Args:
+            payload (dict): The request payload to send to Ollama.
+            on_done (Callable): Called with the last chunk, which holds the context and the timings of the generation.
+
+        Yields:
+            Stream of tokens from the response
+        """
+        url = f"{self.base_url}/api/generate"
+        if self.keep_alive is not None and "keep_alive" not in payload:
+            payload = {**payload, "keep_alive": self.keep_alive}
+
+        try:
+            # Make streaming request on a pooled connection
+            with self.session.post(url, json=payload, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+
+                # Process the stream, the done chunk is the last one: reading to the end (instead of breaking out) returns the connection to the pool
+                for line in response.iter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        if 'error' in chunk:
+                            raise Exception(chunk['error'])
+                        if 'response' in chunk:
+                            yield chunk['response']
+                        if chunk.get('done') and on_done is not None:
+                            on_done(chunk)
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to communicate with Ollama: {str(e)}")
+
+    def warm_up(self, model: str) -> float:
+        """
+        Load a model into memory before the first real request.
+
+        A request without prompt makes Ollama load the model and return at once, the model then stays loaded for keep_alive.
+
+        Args:
+            model (str): The name of the model.
+
+        Returns:
+            The time it took, in seconds.
+        """
+        start = time.perf_counter()
+        for _ in self.generate_stream({"model": model, "prompt": ""}):
+            pass
+        return time.perf_counter() - start
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class AsyncOllamaClient:
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 10, connect_timeout: float = 3.05, read_timeout: float = 120.0, keep_alive: str = "30m"):
+        """
+        Initialize asyncio Ollama client with base URL.
+
+        Requests are sent over a pool of keep-alive HTTP/1.1 connections opened with asyncio streams, so no thread is used per request.
+        The pool size is also the limit on in-flight requests: a request waits for a free connection.
+
+        Args:
+            base_url (str): The URL of the Ollama server.
+            pool_size (int): The largest number of connections, and of requests in flight.
+            connect_timeout (float): Seconds to wait for a connection.
+            read_timeout (float): Seconds to wait for each part of the response.
+            keep_alive (str): How long the server keeps the model loaded after a request, sent with every request that does not set it.
+        """
+        parts = urllib.parse.urlsplit(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.path = parts.path.rstrip('/') + "/api/generate"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle = []
+
+    async def _read(self, awaitable):
+        """Wait for a read of the response, at most read_timeout seconds."""
+        return await asyncio.wait_for(awaitable, self.read_timeout)
+
+    async def _connect(self) -> tuple:
+        """Return an idle pooled connection, or open a new one."""
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl or None), self.connect_timeout)
+
+    async def _lines(self, reader: asyncio.StreamReader, headers: dict) -> AsyncGenerator[bytes, None]:
+        """
+        Read the body of a response and yield it line by line.
+
+        Args:
+            reader (asyncio.StreamReader): The connection.
+            headers (dict): The response headers, with lower case names.
+
+        Yields:
+            The lines of the body, without line terminators.
+        """
+        buffer = b""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                line = await self._read(reader.readline())
+                if not line:
+                    raise ConnectionError("response ended prematurely")
+                size = int(line.split(b";")[0], 16)
+                if size == 0:
+                    # skip the trailers
+                    while (await self._read(reader.readline())) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                buffer += await self._read(reader.readexactly(size))
+                await self._read(reader.readexactly(2))
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                data = await self._read(reader.read(min(remaining, 65536)))
+                if not data:
+                    raise asyncio.IncompleteReadError(buffer, remaining)
+                remaining -= len(data)
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line
+        else:
+            # the body ends when the server closes the connection
+            while data := await self._read(reader.read(65536)):
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line
+        if buffer:
+            yield buffer
+
+    async def generate_stream(self, payload: dict, on_done: Optional[Callable[[dict], None]] = None) -> AsyncGenerator[str, None]:
+        """
+        Generate streaming response from Ollama, asyncio version of OllamaClient.generate_stream.
+
+        Args:
+            payload (dict): The request payload to send to Ollama.
+            on_done (Callable): Called with the last chunk, which holds the context and the timings of the generation.
+
+        Yields:
+            Stream of tokens from the response
+        """
+        if self.keep_alive is not None and "keep_alive" not in payload:
+            payload = {**payload, "keep_alive": self.keep_alive}
+        body = json.dumps(payload).encode()
+        request = (f"POST {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode() + body
+
+        async with self._slots:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            reusable = False
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                writer.write(request)
+                await writer.drain()
+                status_line = await self._read(reader.readline())
+                if not status_line:
+                    raise ConnectionError("connection closed by the server")
+                status = int(status_line.split()[1])
+                headers = {}
+                while (line := await self._read(reader.readline())) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                if status != 200:
+                    text = b"\n".join([line async for line in self._lines(reader, headers)]).decode(errors="replace")
+                    try:
+                        text = json.loads(text).get("error", text)
+                    except (ValueError, AttributeError):
+                        pass
+                    raise Exception(f"Failed to communicate with Ollama: HTTP {status}: {text}")
+                # Process the stream, the done chunk is the last one
+                async for line in self._lines(reader, headers):
+                    if line.strip():
+                        chunk = json.loads(line)
+                        if 'error' in chunk:
+                            raise Exception(chunk['error'])
+                        if 'response' in chunk:
+                            yield chunk['response']
+                        if chunk.get('done') and on_done is not None:
+                            on_done(chunk)
+                reusable = headers.get("connection", "").lower() != "close" and ("transfer-encoding" in headers or "content-length" in headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                raise Exception(f"Failed to communicate with Ollama: {e!r}")
+            finally:
+                self.in_flight -= 1
+                # a connection left in the middle of a response (error, or stream not read to the end) cannot be reused
+                if reusable:
+                    self._idle.append((reader, writer))
+                elif writer is not None:
+                    writer.close()
+
+    async def warm_up(self, model: str) -> float:
+        """
+        Load a model into memory before the first real request, see OllamaClient.warm_up.
+
+        Args:
+            model (str): The name of the model.
+
+        Returns:
+            The time it took, in seconds.
+        """
+        start = time.perf_counter()
+        async for _ in self.generate_stream({"model": model, "prompt": ""}):
+            pass
+        return time.perf_counter() - start
+
+    async def close(self):
+        """Close the pooled connections."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
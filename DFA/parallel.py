@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import random
+from multiprocessing import Pool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from DFA import DFA
+from batch import encode_strings, run_lockstep
+
+# compiled tables attached by each worker process, set by _attach
+_worker_tables = None
+
+def _share(array: np.ndarray) -> tuple:
+    '''
+    Copies an array into a new shared memory block.
+
+    Args:
+    - array (np.ndarray): The array to be shared.
+
+    Returns:
+    - tuple: The shared memory block and the (name, shape, dtype) spec used by workers to attach to it.
+    '''
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def _open_block(name: str) -> SharedMemory:
+    '''
+    Attaches to an existing shared memory block without handing it to the resource tracker.
+    The parent owns the blocks, a tracked block would be unlinked (or reported as leaked) when the worker exits.
+
+    Args:
+    - name (str): The name of the block.
+
+    Returns:
+    - SharedMemory: The attached block.
+    '''
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 attaching always registers the block
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+def _attach(specs: list, initial_id: int, pad_code: int):
+    '''
+    Pool initializer: attaches the worker to the shared transition table, accept array and lookup table.
+
+    Args:
+    - specs (list): The (name, shape, dtype) spec of each shared array.
+    - initial_id (int): The id of the initial state.
+    - pad_code (int): The symbol id used to pad shorter strings.
+    '''
+    global _worker_tables
+    blocks, arrays = [], []
+    for name, shape, dtype in specs:
+        shm = _open_block(name)
+        blocks.append(shm)
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    _worker_tables = (blocks, *arrays, initial_id, pad_code)
+
+def _run_chunk(input_strings: list) -> np.ndarray:
+    '''
+    Runs one chunk of input strings against the attached tables.
+
+    Args:
+    - input_strings (list): The chunk of input strings.
+
+    Returns:
+    - np.ndarray: A boolean array, True where the corresponding input string is accepted.
+    '''
+    _, table, accept, lut, initial_id, pad_code = _worker_tables
+    codes, _ = encode_strings(input_strings, lut, pad_code)
+    return run_lockstep(table, accept, initial_id, codes)
+
+class ParallelRunner:
+    '''
+    A process pool running batches of input strings through a compiled DFA.
+    Workers attach to the transition table through shared memory, so the DFA object itself is never pickled.
+
+    Attributes:
+    - workers (int): The number of worker processes.
+    - chunk_size (int): The number of input strings sent to a worker at a time.
+
+    Methods:
+    - bulk_run(input_strings: list) -> np.ndarray: Processes a list of input strings and returns a boolean accept array in input order.
+    - close(): Stops the workers and releases the shared memory.
+    '''
+    def __init__(self, dfa: DFA, workers: int = None, chunk_size: int = 50000):
+        '''
+        Shares the compiled tables of a DFA and starts the worker processes.
+
+        Args:
+        - dfa (DFA): The DFA to run.
+        - workers (int): The number of worker processes. If None, one per CPU.
+        - chunk_size (int): The number of input strings sent to a worker at a time.
+        '''
+        if chunk_size < 1:
+            raise ValueError("Error: chunk_size must be positive")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._blocks, specs = [], []
+        try:
+            for array in dfa._numpy_tables():
+                shm, spec = _share(array)
+                self._blocks.append(shm)
+                specs.append(spec)
+            self._pool = Pool(self.workers, initializer=_attach, initargs=(specs, dfa.initial_id, dfa.pad_code))
+        except BaseException:
+            # no runner to close: release the blocks shared so far, they would outlive the process otherwise
+            self._release()
+            raise
+
+    def bulk_run(self, input_strings: list) -> np.ndarray:
+        '''
+        Runs a list of input strings through the DFA on all the workers.
+
+        Args:
+        - input_strings (list): A list of input strings to be processed.
+
+        Returns:
+        - np.ndarray: A boolean array, True where the corresponding input string is accepted, in input order.
+        '''
+        input_strings = list(input_strings)
+        chunks = (input_strings[i:i + self.chunk_size] for i in range(0, len(input_strings), self.chunk_size))
+        # imap keeps the chunks in submission order
+        results = list(self._pool.imap(_run_chunk, chunks))
+        return np.concatenate(results) if results else np.zeros(0, dtype=bool)
+
+    def close(self):
+        '''
+        Stops the workers and releases the shared memory.
+        '''
+        self._pool.close()
+        self._pool.join()
+        self._release()
+
+    def _release(self):
+        '''
+        Closes and unlinks the shared memory blocks.
+        '''
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def bulk_run_parallel(dfa: DFA, input_strings: list, workers: int = None, chunk_size: int = 50000) -> np.ndarray:
+    '''
+    Runs a list of input strings through a DFA on a temporary process pool.
+
+    Args:
+    - dfa (DFA): The DFA to run.
+    - input_strings (list): A list of input strings to be processed.
+    - workers (int): The number of worker processes. If None, one per CPU.
+    - chunk_size (int): The number of input strings sent to a worker at a time.
+
+    Returns:
+    - np.ndarray: A boolean array, True where the corresponding input string is accepted, in input order.
+    '''
+    with ParallelRunner(dfa, workers, chunk_size) as runner:
+        return runner.bulk_run(input_strings)
+
+def benchmark(dfa: DFA, input_strings: list, max_workers: int = None, chunk_size: int = 50000) -> list:
+    '''
+    Measures how bulk_run_parallel scales from 1 to max_workers processes. Pool start-up is not timed.
+
+    Args:
+    - dfa (DFA): The DFA to run.
+    - input_strings (list): The input strings processed at every worker count.
+    - max_workers (int): The largest number of workers. If None, one per CPU.
+    - chunk_size (int): The number of input strings sent to a worker at a time.
+
+    Returns:
+    - list: A list of tuples (workers, seconds, strings per second, speedup over one worker).
+    '''
+    rows = []
+    for workers in range(1, (max_workers or os.cpu_count() or 1) + 1):
+        with ParallelRunner(dfa, workers, chunk_size) as runner:
+            start = time.perf_counter()
+            runner.bulk_run(input_strings)
+            elapsed = time.perf_counter() - start
+        rows.append((workers, elapsed, len(input_strings) / elapsed, rows[0][1] / elapsed if rows else 1.0))
+    return rows
+
+# Usage: python parallel.py [dfa.json] [n_strings]
+if __name__ == "__main__":
+    dfa_handler = DFA(sys.argv[1] if len(sys.argv) > 1 else "dfa.json")
+    n_strings = int(sys.argv[2]) if len(sys.argv) > 2 else 2000000
+    strings = ["".join(random.choices(dfa_handler.alphabet, k=random.randint(1, 16))) for _ in range(n_strings)]
+    print(f"{'workers':>8} {'seconds':>10} {'strings/s':>14} {'speedup':>8}")
+    for workers, elapsed, rate, speedup in benchmark(dfa_handler, strings):
+        print(f"{workers:>8} {elapsed:>10.3f} {rate:>14,.0f} {speedup:>8.2f}")
@@ -0,0 +1,262 @@
+from collections import deque
+
+class StateLimitExceeded(Exception):
+    '''
+    Raised when an automaton built on demand would grow past its configured number of states.
+    '''
+
+class ProductDFA:
+    '''
+    A lazily constructed product of several DFAs, accepting according to a boolean combination of their results.
+    Only the tuples of component states (pair-states) reached by run or by a search are built, each one once.
+    The combination may also return any other value (e.g. which components accept), see evaluate.
+
+    Attributes:
+    - dfas (list): The component DFAs.
+    - symbols (list): The union of the component alphabets, indexed by symbol id.
+    - symbol_index (dict): Mapping from each symbol to its id.
+    - initial_id (int): The id of the initial pair-state.
+    - max_states (int): The largest number of pair-states that may be built, None for no limit. Building more raises StateLimitExceeded.
+
+    Methods:
+    - run(input_string: str) -> bool: Processes an input string and returns True if the combination accepts it.
+    - evaluate(input_string: str): Processes an input string and returns the value of the combination.
+    - shortest_accepted() -> str: Returns a shortest accepted string, or None if the language is empty.
+    - is_empty() -> bool: True if no string is accepted.
+    - to_dfa() -> DFA: Builds the whole reachable product as a DFA.
+    '''
+    def __init__(self, dfas: list, accept, max_states: int = None):
+        '''
+        Constructs a new product, no pair-state is built except the initial one.
+
+        Args:
+        - dfas (list): The component DFAs.
+        - accept (callable): Function from the tuple of component results (bools) to the result of the product.
+        - max_states (int): The largest number of pair-states that may be built, None for no limit.
+        '''
+        self.dfas = list(dfas)
+        self._accept = accept
+        self.max_states = max_states
+        self.symbols = []
+        for dfa in self.dfas:
+            self.symbols.extend(symbol for symbol in dfa.symbols if symbol not in self.symbols)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # per component, the component symbol id of every product symbol (None if the component does not know it)
+        self._columns = [[dfa.symbol_index.get(symbol) for symbol in self.symbols] for dfa in self.dfas]
+        self._index = {}
+        self._pairs = []
+        # value of the combination in each pair-state
+        self._accepting = []
+        # next pair-state id of (pair-state, symbol), -1 until it is needed
+        self._delta = []
+        self.initial_id = self._intern(tuple(dfa.initial_id for dfa in self.dfas))
+
+    def __len__(self) -> int:
+        '''
+        Returns the number of pair-states built so far.
+        '''
+        return len(self._pairs)
+
+    def _intern(self, pair: tuple) -> int:
+        '''
+        Returns the id of a pair-state, creating it on first sight.
+
+        Args:
+        - pair (tuple): The state id in each component.
+
+        Returns:
+        - int: The id of the pair-state.
+        '''
+        pid = self._index.get(pair)
+        if pid is None:
+            if self.max_states is not None and len(self._pairs) >= self.max_states:
+                raise StateLimitExceeded(f"Error: product exceeds {self.max_states} pair-states")
+            pid = self._index[pair] = len(self._pairs)
+            self._pairs.append(pair)
+            self._accepting.append(self._accept(tuple(dfa.accept_bitmap[state] == 1 for dfa, state in zip(self.dfas, pair))))
+            self._delta.extend([-1] * len(self.symbols))
+        return pid
+
+    def _next(self, pid: int, symbol: int) -> int:
+        '''
+        Returns the pair-state reached from a pair-state with a symbol, building it on first use.
+
+        Args:
+        - pid (int): The id of the pair-state.
+        - symbol (int): The product symbol id.
+
+        Returns:
+        - int: The id of the next pair-state.
+        '''
+        i = pid * len(self.symbols) + symbol
+        next_id = self._delta[i]
+        if next_id < 0:
+            pair = []
+            for dfa, columns, state in zip(self.dfas, self._columns, self._pairs[pid]):
+                column = columns[symbol]
+                pair.append(dfa.dead_state if column is None else dfa.table[state * len(dfa.symbols) + column])
+            next_id = self._delta[i] = self._intern(tuple(pair))
+        return next_id
+
+    def _final(self, input_string: str) -> int:
+        '''
+        Returns the pair-state reached with an input string.
+
+        Args:
+        - input_string (str): The input string to be processed.
+
+        Returns:
+        - int: The id of the pair-state, or None if the string has a symbol outside every component alphabet.
+        '''
+        symbol_index, state = self.symbol_index, self.initial_id
+        for s in input_string:
+            symbol = symbol_index.get(s)
+            # unrecognized symbol
+            if symbol is None:
+                return None
+            state = self._next(state, symbol)
+        return state
+
+    def run(self, input_string: str) -> bool:
+        '''
+        Processes an input string and returns True if the combination of the component results accepts it.
+        Symbols outside every component alphabet are rejected.
+
+        Args:
+        - input_string (str): The input string to be processed.
+
+        Returns:
+        - bool: True if the input string is accepted, False otherwise.
+        '''
+        state = self._final(input_string)
+        return state is not None and bool(self._accepting[state])
+
+    def evaluate(self, input_string: str):
+        '''
+        Processes an input string and returns the value of the combination for the component results.
+        A symbol outside every component alphabet makes every component reject.
+
+        Args:
+        - input_string (str): The input string to be processed.
+
+        Returns:
+        - The value returned by the combination.
+        '''
+        state = self._final(input_string)
+        return self._accept((False,) * len(self.dfas)) if state is None else self._accepting[state]
+
+    def shortest_accepted(self) -> str:
+        '''
+        Searches the reachable pair-states breadth-first for an accepting one.
+
+        Returns:
+        - str: A shortest accepted string (a tuple of symbols for token alphabets), or None if no string is accepted.
+        '''
+        parent = {self.initial_id: None}
+        queue = deque([self.initial_id])
+        while queue:
+            pid = queue.popleft()
+            if self._accepting[pid]:
+                path = []
+                while parent[pid] is not None:
+                    pid, symbol = parent[pid]
+                    path.append(self.symbols[symbol])
+                path.reverse()
+                # token alphabets give a tuple of symbols, as DFA.join does
+                return "".join(path) if all(isinstance(s, str) and len(s) == 1 for s in self.symbols) else tuple(path)
+            for symbol in range(len(self.symbols)):
+                next_id = self._next(pid, symbol)
+                if next_id not in parent:
+                    parent[next_id] = (pid, symbol)
+                    queue.append(next_id)
+        return None
+
+    def is_empty(self) -> bool:
+        '''
+        True if the product accepts no string.
+        '''
+        return self.shortest_accepted() is None
+
+    def to_dfa(self):
+        '''
+        Builds every reachable pair-state and returns the product as a DFA.
+        States are named after the tuple of component states, "-" standing for a dead component.
+
+        Returns:
+        - DFA: The product DFA.
+        '''
+        queue, seen = deque([self.initial_id]), {self.initial_id}
+        while queue:
+            pid = queue.popleft()
+            for symbol in range(len(self.symbols)):
+                next_id = self._next(pid, symbol)
+                if next_id not in seen:
+                    seen.add(next_id)
+                    queue.append(next_id)
+
+        def name(pid):
+            return "(" + ", ".join("-" if state == dfa.dead_state else str(dfa.state_names[state]) for dfa, state in zip(self.dfas, self._pairs[pid])) + ")"
+
+        def is_sink(pid):
+            # rejecting with every component dead, an undefined transition behaves the same
+            return not self._accepting[pid] and all(state == dfa.dead_state for dfa, state in zip(self.dfas, self._pairs[pid]))
+
+        ids = sorted(seen)
+        return type(self.dfas[0]).from_dict({
+            "states": [name(pid) for pid in ids if not is_sink(pid)],
+            "alphabet": list(self.symbols),
+            "transitions": [{"from": name(pid), "to": name(self._next(pid, symbol)), "input": self.symbols[symbol]} for pid in ids if not is_sink(pid) for symbol in range(len(self.symbols)) if not is_sink(self._next(pid, symbol))],
+            "initialState": name(self.initial_id),
+            "acceptStates": [name(pid) for pid in ids if self._accepting[pid]],
+        })
+
+def intersection(*dfas) -> ProductDFA:
+    '''
+    Returns the lazy product accepting the strings accepted by every DFA.
+    '''
+    return ProductDFA(dfas, all)
+
+def union(*dfas) -> ProductDFA:
+    '''
+    Returns the lazy product accepting the strings accepted by at least one DFA.
+    '''
+    return ProductDFA(dfas, any)
+
+def difference(a, b) -> ProductDFA:
+    '''
+    Returns the lazy product accepting the strings accepted by a and rejected by b.
+    '''
+    return ProductDFA([a, b], lambda results: results[0] and not results[1])
+
+def symmetric_difference(a, b) -> ProductDFA:
+    '''
+    Returns the lazy product accepting the strings accepted by exactly one of a and b.
+    '''
+    return ProductDFA([a, b], lambda results: results[0] != results[1])
+
+def complement(a) -> ProductDFA:
+    '''
+    Returns the lazy automaton accepting the strings over the alphabet of a that a rejects.
+    Strings with symbols outside the alphabet are still rejected.
+    '''
+    return ProductDFA([a], lambda results: not results[0])
+
+def is_subset(a, b) -> tuple:
+    '''
+    Checks whether every string accepted by a is accepted by b.
+
+    Returns:
+    - tuple: True and None if it is, False and a shortest string accepted by a but not by b otherwise.
+    '''
+    counterexample = difference(a, b).shortest_accepted()
+    return counterexample is None, counterexample
+
+def equivalent(a, b) -> tuple:
+    '''
+    Checks whether a and b accept the same strings.
+
+    Returns:
+    - tuple: True and None if they do, False and a shortest string accepted by only one of them otherwise.
+    '''
+    counterexample = symmetric_difference(a, b).shortest_accepted()
+    return counterexample is None, counterexample
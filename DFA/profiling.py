@@ -0,0 +1,168 @@
+import json
+import time
+from bisect import bisect_left
+
+# upper bounds of the run-length histogram buckets, in symbols
+LENGTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1, 1.0)
+REASONS = ("unknown_symbol", "undefined_transition", "non_accepting")
+
+class Profile:
+    '''
+    Counters collected by the instrumented run of a DFA, see DFA.profile.
+    The plain DFA.run is left untouched: while profiling is enabled, the DFA instance uses the run of this class instead.
+
+    Attributes:
+    - dfa (DFA): The profiled DFA.
+    - runs (int): The number of strings run.
+    - accepted (int): The number of accepted strings.
+    - state_visits (list): The number of times each state id was entered, the initial state once per run.
+    - transition_hits (list): The number of times each transition was taken, indexed like dfa.table.
+    - rejections (dict): The number of rejected strings per reason: unknown symbol, undefined transition or non-accepting final state.
+    - length_counts (list): The number of strings per run-length bucket, one more bucket than LENGTH_BUCKETS for longer strings.
+    - length_sum (int): The total number of symbols read.
+    - latency_counts (list): The number of runs per latency bucket, one more bucket than LATENCY_BUCKETS for slower runs.
+    - latency_sum (float): The total time spent in runs, in seconds.
+
+    Methods:
+    - run(input_string) -> bool: Runs an input string through the DFA and records it.
+    - reset(): Clears every counter.
+    - to_dict() -> dict: Returns the counters, with states and symbols by name.
+    - to_json() -> str: Returns the counters as JSON.
+    - to_prometheus(prefix: str = "dfa") -> str: Returns the counters in the Prometheus text exposition format.
+    '''
+    def __init__(self, dfa):
+        '''
+        Constructs empty counters for a compiled DFA.
+
+        Args:
+        - dfa (DFA): The DFA to profile.
+        '''
+        self.dfa = dfa
+        self.reset()
+
+    def reset(self):
+        '''
+        Clears every counter.
+        '''
+        self.runs = 0
+        self.accepted = 0
+        self.state_visits = [0] * (self.dfa.dead_state + 1)
+        self.transition_hits = [0] * len(self.dfa.table)
+        self.rejections = dict.fromkeys(REASONS, 0)
+        self.length_counts = [0] * (len(LENGTH_BUCKETS) + 1)
+        self.length_sum = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    def run(self, input_string) -> bool:
+        '''
+        Processes an input string like DFA.run and records the states visited, the transitions taken, the outcome, the length and the latency.
+
+        Args:
+        - input_string (str or sequence): The input string, or sequence of symbols, to be processed.
+
+        Returns:
+        - bool: True if the input string is accepted by the DFA, False otherwise.
+        '''
+        start = time.perf_counter()
+        dfa = self.dfa
+        table, width, dead_state, symbol_index = dfa.table, len(dfa.symbols), dfa.dead_state, dfa.symbol_index
+        state_visits, transition_hits = self.state_visits, self.transition_hits
+        current_state = dfa.initial_id
+        state_visits[current_state] += 1
+        reason = None
+        length = 0
+        for s in input_string:
+            length += 1
+            symbol = symbol_index.get(s)
+            if symbol is None:
+                reason = "unknown_symbol"
+                break
+            i = current_state * width + symbol
+            current_state = table[i]
+            if current_state == dead_state:
+                reason = "undefined_transition"
+                break
+            transition_hits[i] += 1
+            state_visits[current_state] += 1
+        accepted = reason is None and dfa.accept_bitmap[current_state] == 1
+        if reason is None and not accepted:
+            reason = "non_accepting"
+        elapsed = time.perf_counter() - start
+
+        self.runs += 1
+        if accepted:
+            self.accepted += 1
+        else:
+            self.rejections[reason] += 1
+        # strings are bucketed by the number of symbols read before the outcome was decided
+        self.length_counts[bisect_left(LENGTH_BUCKETS, length)] += 1
+        self.length_sum += length
+        self.latency_counts[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.latency_sum += elapsed
+        return accepted
+
+    def to_dict(self) -> dict:
+        '''
+        Returns the counters, with states and symbols by name. States and transitions never visited are omitted.
+
+        Returns:
+        - dict: The counters.
+        '''
+        dfa = self.dfa
+        width = len(dfa.symbols)
+        return {
+            "runs": self.runs,
+            "accepted": self.accepted,
+            "rejections": dict(self.rejections),
+            "stateVisits": {str(dfa.state_names[state]): count for state, count in enumerate(self.state_visits[:dfa.dead_state]) if count},
+            "transitionHits": [{"from": dfa.state_names[i // width], "input": dfa.symbols[i % width], "to": dfa.state_names[dfa.table[i]], "hits": count} for i, count in enumerate(self.transition_hits) if count],
+            "lengthHistogram": {"buckets": list(LENGTH_BUCKETS), "counts": list(self.length_counts), "sum": self.length_sum},
+            "latencyHistogram": {"buckets": list(LATENCY_BUCKETS), "counts": list(self.latency_counts), "sum": self.latency_sum},
+        }
+
+    def to_json(self) -> str:
+        '''
+        Returns the counters as JSON, see to_dict.
+        '''
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self, prefix: str = "dfa") -> str:
+        '''
+        Returns the counters in the Prometheus text exposition format.
+
+        Args:
+        - prefix (str): The prefix of every metric name.
+
+        Returns:
+        - str: The metrics text.
+        '''
+        def label(value) -> str:
+            return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+        def histogram(name: str, help_text: str, buckets: tuple, counts: list, total: float) -> list:
+            lines = [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} histogram"]
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_{name}_bucket{{le="+Inf"}} {self.runs}')
+            lines.append(f"{prefix}_{name}_sum {total}")
+            lines.append(f"{prefix}_{name}_count {self.runs}")
+            return lines
+
+        dfa = self.dfa
+        width = len(dfa.symbols)
+        lines = [f"# HELP {prefix}_runs_total Strings run.", f"# TYPE {prefix}_runs_total counter", f"{prefix}_runs_total {self.runs}",
+                 f"# HELP {prefix}_accepted_total Strings accepted.", f"# TYPE {prefix}_accepted_total counter", f"{prefix}_accepted_total {self.accepted}",
+                 f"# HELP {prefix}_rejections_total Strings rejected, by reason.", f"# TYPE {prefix}_rejections_total counter"]
+        lines.extend(f"{prefix}_rejections_total{{reason={label(reason)}}} {count}" for reason, count in self.rejections.items())
+        lines.extend([f"# HELP {prefix}_state_visits_total Times each state was entered.", f"# TYPE {prefix}_state_visits_total counter"])
+        lines.extend(f"{prefix}_state_visits_total{{state={label(dfa.state_names[state])}}} {count}" for state, count in enumerate(self.state_visits[:dfa.dead_state]) if count)
+        lines.extend([f"# HELP {prefix}_transition_hits_total Times each transition was taken.", f"# TYPE {prefix}_transition_hits_total counter"])
+        lines.extend(f"{prefix}_transition_hits_total{{from={label(dfa.state_names[i // width])},input={label(dfa.symbols[i % width])}}} {count}" for i, count in enumerate(self.transition_hits) if count)
+        lines.extend(histogram("run_length_symbols", "Symbols read per string before the outcome was decided.", LENGTH_BUCKETS, self.length_counts, self.length_sum))
+        lines.extend(histogram("run_latency_seconds", "Time spent per string.", LATENCY_BUCKETS, self.latency_counts, self.latency_sum))
+        return "\n".join(lines) + "\n"
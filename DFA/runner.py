@@ -0,0 +1,115 @@
+from DFA import DFA
+
+class Runner:
+    '''
+    A resumable run of a DFA over input that arrives in chunks.
+    Only the current state is kept, so arbitrarily long streams are classified in constant memory.
+
+    Attributes:
+    - dfa (DFA): The DFA being run.
+    - state (int): The integer id of the current state, dfa.dead_state after an unknown symbol or an undefined transition.
+    - consumed (int): The number of symbols consumed so far.
+
+    Methods:
+    - feed(chunk: str) -> bool: Consumes a chunk of input and returns False once the run is dead.
+    - step(symbol: str) -> bool: Consumes a single symbol and returns False once the run is dead.
+    - is_accepting -> bool: True if the input consumed so far is accepted.
+    - is_dead -> bool: True if no continuation of the input consumed so far can be accepted.
+    - snapshot() -> tuple: Returns the position of the run.
+    - restore(snapshot: tuple): Moves the run back to a position returned by snapshot.
+    - reset(): Moves the run back to the initial state.
+    '''
+    __slots__ = ("dfa", "state", "consumed")
+
+    def __init__(self, dfa: DFA):
+        '''
+        Constructs a new run positioned at the initial state of the DFA.
+
+        Args:
+        - dfa (DFA): The DFA to run.
+        '''
+        self.dfa = dfa
+        self.state = dfa.initial_id
+        self.consumed = 0
+
+    def feed(self, chunk: str) -> bool:
+        '''
+        Consumes a chunk of input. Once the run is dead the rest of the chunk is not read.
+
+        Args:
+        - chunk (str): The next chunk of input.
+
+        Returns:
+        - bool: False if the run is dead, True otherwise.
+        '''
+        dfa = self.dfa
+        table, width, dead_state, symbol_index, live_bitmap = dfa.table, len(dfa.symbols), dfa.dead_state, dfa.symbol_index, dfa.live_bitmap
+        state = self.state
+        if not live_bitmap[state]:
+            return False
+        consumed = 0
+        for s in chunk:
+            consumed += 1
+            symbol = symbol_index.get(s)
+            # unrecognized symbol
+            state = dead_state if symbol is None else table[state * width + symbol]
+            # no accepting state can be reached anymore, the outcome is decided
+            if not live_bitmap[state]:
+                break
+        self.state = state
+        self.consumed += consumed
+        return live_bitmap[state] == 1
+
+    def step(self, symbol: str) -> bool:
+        '''
+        Consumes a single symbol.
+
+        Args:
+        - symbol (str): The next symbol.
+
+        Returns:
+        - bool: False if the run is dead, True otherwise.
+        '''
+        return self.feed((symbol,))
+
+    @property
+    def is_accepting(self) -> bool:
+        '''
+        True if the input consumed so far is accepted by the DFA.
+        '''
+        return self.dfa.accept_bitmap[self.state] == 1
+
+    @property
+    def is_dead(self) -> bool:
+        '''
+        True if no continuation of the input consumed so far can be accepted.
+        '''
+        return self.dfa.live_bitmap[self.state] == 0
+
+    def snapshot(self) -> tuple:
+        '''
+        Returns the position of the run.
+
+        Returns:
+        - tuple: The current state id and the number of symbols consumed.
+        '''
+        return self.state, self.consumed
+
+    def restore(self, snapshot: tuple):
+        '''
+        Moves the run back to a position returned by snapshot.
+
+        Args:
+        - snapshot (tuple): The position to restore.
+        '''
+        state, consumed = snapshot
+        if not 0 <= state <= self.dfa.dead_state:
+            raise ValueError("Error: snapshot does not belong to this DFA")
+        self.state, self.consumed = state, consumed
+
+    def reset(self):
+        '''
+        Moves the run back to the initial state.
+        '''
+        self.state = self.dfa.initial_id
+        self.consumed = 0
@@ -0,0 +1,156 @@
+import random
+import numpy as np
+
+class Sampler:
+    '''
+    Counts the strings over the alphabet of a DFA that are accepted (or rejected) and samples them uniformly at random.
+    counts[length][state] is the number of strings of that length leading from state to a target state.
+    The counts are exact Python integers, so lengths in the thousands are supported.
+
+    Attributes:
+    - dfa (DFA): The DFA whose language is sampled.
+    - accepted (bool): True to count and sample accepted strings, False for rejected ones.
+
+    Methods:
+    - count(length: int) -> int: Returns the number of target strings of the given length.
+    - sample(min_length: int, max_length: int = None, rng=random) -> str: Samples a target string uniformly among the target strings in the length range.
+    - sample_batch(length: int, n: int, seed=None) -> np.ndarray: Samples many target strings of one length at once, as a matrix of symbol ids.
+    - decode(codes: np.ndarray) -> list: Turns a matrix of symbol ids back into strings.
+    '''
+    def __init__(self, dfa, accepted: bool = True):
+        '''
+        Constructs a new sampler, counts are computed on demand up to the longest length requested.
+
+        Args:
+        - dfa (DFA): The DFA whose language is sampled.
+        - accepted (bool): True to count and sample accepted strings, False for rejected ones.
+        '''
+        self.dfa = dfa
+        self.accepted = accepted
+        target = 1 if accepted else 0
+        # the dead state is a regular (rejecting) state here, so rejected strings that leave the defined transitions are counted
+        self._counts = [[1 if bit == target else 0 for bit in dfa.accept_bitmap]]
+        self._probabilities = None
+
+    def _extend(self, length: int):
+        '''
+        Computes the counts of every length up to the given one.
+
+        Args:
+        - length (int): The longest length needed.
+        '''
+        table, width = self.dfa.table, len(self.dfa.symbols)
+        rows = range(self.dfa.dead_state + 1)
+        counts = self._counts
+        while len(counts) <= length:
+            previous = counts[-1].__getitem__
+            counts.append([sum(map(previous, table[q * width:(q + 1) * width])) for q in rows])
+
+    def count(self, length: int) -> int:
+        '''
+        Returns the number of target strings of the given length.
+
+        Args:
+        - length (int): The length of the strings.
+
+        Returns:
+        - int: The number of accepted (or rejected) strings of that length.
+        '''
+        self._extend(length)
+        return self._counts[length][self.dfa.initial_id]
+
+    def _walk(self, length: int, rng) -> str:
+        '''
+        Builds a target string of the given length one symbol at a time.
+        Each symbol is drawn with probability proportional to the number of completions it leaves.
+        '''
+        table, width, symbols, counts = self.dfa.table, len(self.dfa.symbols), self.dfa.symbols, self._counts
+        state, result = self.dfa.initial_id, []
+        for remaining in range(length, 0, -1):
+            r = rng.randrange(counts[remaining][state])
+            row = counts[remaining - 1]
+            for symbol in range(width):
+                next_state = table[state * width + symbol]
+                r -= row[next_state]
+                if r < 0:
+                    break
+            result.append(symbols[symbol])
+            state = next_state
+        return self.dfa.join(result)
+
+    def sample(self, min_length: int, max_length: int = None, rng=random) -> str:
+        '''
+        Samples a target string uniformly among all the target strings with length between min_length and max_length.
+
+        Args:
+        - min_length (int): The minimum length of the string.
+        - max_length (int): The maximum length of the string. If None, equal to min_length.
+        - rng (random.Random): The source of randomness.
+
+        Returns:
+        - str: The sampled string (a tuple of symbols for token alphabets, see DFA.join), or None if there is no target string in the length range.
+        '''
+        max_length = min_length if max_length is None else max_length
+        self._extend(max_length)
+        initial_id = self.dfa.initial_id
+        total = sum(self._counts[length][initial_id] for length in range(min_length, max_length + 1))
+        if total == 0:
+            return None
+        r = rng.randrange(total)
+        for length in range(min_length, max_length + 1):
+            r -= self._counts[length][initial_id]
+            if r < 0:
+                return self._walk(length, rng)
+
+    def sample_batch(self, length: int, n: int, seed=None) -> np.ndarray:
+        '''
+        Samples n target strings of the given length at once with NumPy.
+        The transition probabilities are the exact ratios of the counts rounded to float64, so sampling is uniform up to that rounding.
+
+        Args:
+        - length (int): The length of the strings.
+        - n (int): The number of strings.
+        - seed: Seed for numpy.random.default_rng.
+
+        Returns:
+        - np.ndarray: A (n, length) matrix of symbol ids, see run_encoded and decode.
+        '''
+        if self.count(length) == 0:
+            raise ValueError(f"Error: no string of length {length} to sample")
+        table, width = self.dfa.table, len(self.dfa.symbols)
+        n_rows = self.dfa.dead_state + 1
+        if self._probabilities is None:
+            self._probabilities = []
+        # cumulative probability of each symbol, for every remaining length and state
+        while len(self._probabilities) < length:
+            remaining = len(self._probabilities) + 1
+            row, previous = self._counts[remaining], self._counts[remaining - 1]
+            probabilities = np.zeros((n_rows, width))
+            for q in range(n_rows):
+                if row[q]:
+                    probabilities[q] = [previous[t] / row[q] for t in table[q * width:(q + 1) * width]]
+            self._probabilities.append(np.cumsum(probabilities, axis=1))
+        next_state = np.asarray(table, dtype=np.int64).reshape(n_rows, width)
+        rng = np.random.default_rng(seed)
+        codes = np.empty((n, length), dtype=np.int32)
+        states = np.full(n, self.dfa.initial_id, dtype=np.int64)
+        for i in range(length):
+            cumulative = self._probabilities[length - i - 1][states]
+            # symbols with zero probability share their cumulative value with the previous one and are never counted
+            symbols = (cumulative <= rng.random(n)[:, None] * cumulative[:, -1:]).sum(axis=1)
+            codes[:, i] = symbols
+            states = next_state[states, symbols]
+        return codes
+
+    def decode(self, codes: np.ndarray) -> list:
+        '''
+        Turns a matrix of symbol ids back into strings (tuples of symbols for token alphabets, see DFA.join).
+
+        Args:
+        - codes (np.ndarray): A (n, length) matrix of symbol ids.
+
+        Returns:
+        - list: The list of strings.
+        '''
+        symbols, join = self.dfa.symbols, self.dfa.join
+        return [join([symbols[symbol] for symbol in row]) for row in codes.tolist()]
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Callable, Optional
+from ollama import AsyncOllamaClient
+from intents import IntentResolver
+from mdfa import MerchantDFA
+from npc import load_character
+
+class SessionManager:
+    def __init__(self, npc_factory: Optional[Callable] = None, client: Optional[AsyncOllamaClient] = None, max_in_flight: int = 8, base_url: str = "http://localhost:11434",
+                 speculate: int = 0, max_speculative: Optional[int] = None, structured: bool = False):
+        """
+        Host the NPC conversations of many players in one asyncio process.
+
+        Every player gets its own NPC, holding the current state and the history of the conversation.
+        The turns of one player run one at a time, the turns of different players run concurrently.
+        All the NPCs share one client, whose pool size bounds the LLM requests in flight.
+
+        Args:
+            npc_factory (Callable): Builds the NPC of a new player from the shared client. By default a MerchantDFA, all of them sharing one IntentResolver.
+            client (AsyncOllamaClient): The shared client. If None, one is created with max_in_flight connections.
+            max_in_flight (int): The largest number of LLM requests in flight, when the client is created here.
+            base_url (str): The URL of the Ollama server, when the client is created here.
+            speculate (int): The next states whose replies each default NPC generates while the intent is classified, 0 to disable.
+            max_speculative (int): The largest number of speculative replies generated at once by all the default NPCs, by default a quarter of the connections of the client (at least one), so that guesses leave most of the pool to the real requests.
+            structured (bool): If True, the default NPCs get the intent and the reply from one structured request, see MerchantDFA.change_state_structured.
+        """
+        self.client = client or AsyncOllamaClient(base_url, pool_size=max_in_flight)
+        if npc_factory is None:
+            resolver = IntentResolver(load_character("merchant.json").intent_examples)
+            if max_speculative is None:
+                max_speculative = max(1, getattr(self.client, "pool_size", max_in_flight) // 4)
+            slots = asyncio.Semaphore(max_speculative)
+            npc_factory = lambda client: MerchantDFA(async_client=client, resolver=resolver, speculate=speculate, speculation_slots=slots, structured=structured)
+        self.npc_factory = npc_factory
+        self.sessions = {}
+        self._locks = {}
+
+    def session(self, player_id):
+        """Return the NPC talking with a player, created on the first turn."""
+        npc = self.sessions.get(player_id)
+        if npc is None:
+            npc = self.sessions[player_id] = self.npc_factory(self.client)
+            self._locks[player_id] = asyncio.Lock()
+        return npc
+
+    async def turn(self, player_id, user_response: str, on_token: Optional[Callable] = None) -> str:
+        """
+        Play one turn of a player: classify the response, move the NPC and generate its reply.
+
+        Args:
+            player_id: Any hashable identifying the player.
+            user_response (str): What the player said.
+            on_token (Callable): Called with every token of the reply as it arrives.
+
+        Returns:
+            The reply of the NPC.
+        """
+        npc = self.session(player_id)
+        async with self._locks[player_id]:
+            return await npc.change_state_async(user_response, on_token)
+
+    def end(self, player_id):
+        """Forget the conversation of a player. Return its NPC, None if there was none."""
+        self._locks.pop(player_id, None)
+        return self.sessions.pop(player_id, None)
+
+    async def close(self):
+        """Close the connections of the shared client."""
+        await self.client.close()
+
+# Usage: python sessions.py [n_players]
+if __name__ == "__main__":
+    import sys
+
+    async def main(n_players):
+        manager = SessionManager()
+        await manager.client.warm_up("llama3.2")
+        replies = await asyncio.gather(*(manager.turn(player, "Hello, what do you sell?") for player in range(n_players)))
+        for player, reply in enumerate(replies):
+            print(f"[{player}] {manager.sessions[player].actual_state}: {reply}")
+        await manager.close()
+
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 4))
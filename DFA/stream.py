@@ -0,0 +1,188 @@
+import sys
+import mmap
+import codecs
+import struct
+import numpy as np
+from DFA import DFA
+
+def _byte_tables(dfa: DFA, encoding: str) -> np.ndarray:
+    '''
+    Builds the byte to symbol id lookup table used to run records straight from the mapped buffer.
+
+    Args:
+    - dfa (DFA): The DFA to run.
+    - encoding (str): The encoding of the records.
+
+    Returns:
+    - np.ndarray: A 256-entry lookup table, or None if some symbol does not match exactly one byte and records must be decoded.
+    '''
+    if not dfa.char_alphabet:
+        return None
+    name = codecs.lookup(encoding).name
+    # in these encodings a byte equal to a single-byte symbol always is that symbol
+    limit = {"utf-8": 128, "ascii": 128, "latin-1": 256, "iso8859-1": 256}.get(name)
+    if limit is None:
+        return None
+    if any(len(symbol) == 1 and ord(symbol) >= limit for symbol in dfa.symbols if isinstance(symbol, str)):
+        return None
+    _, _, lut = dfa._numpy_tables()
+    byte_lut = lut[:256].copy()
+    byte_lut[limit:] = dfa.unknown_code
+    return byte_lut
+
+def _run_records(dfa: DFA, byte_lut: np.ndarray, encoding: str, delimiter: str, mm: mmap.mmap, base: int, size: int, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    '''
+    Runs every record of a window of the mapped file through the DFA.
+    The records are advanced in lockstep, sorted by length so that the records still running are always a prefix.
+
+    Args:
+    - dfa (DFA): The DFA to run.
+    - byte_lut (np.ndarray): The byte lookup table, or None to decode each record.
+    - encoding (str): The encoding of the records.
+    - delimiter (str): The string between two symbols of a record when the symbols are not single characters, see DFA.tokenize.
+    - mm (mmap.mmap): The mapped file.
+    - base (int): The offset of the window in the file.
+    - size (int): The size of the window in bytes.
+    - starts (np.ndarray): The start of each record, relative to the window.
+    - lengths (np.ndarray): The length of each record in bytes.
+
+    Returns:
+    - np.ndarray: A boolean array, True where the corresponding record is accepted.
+    '''
+    if byte_lut is None:
+        records = [mm[base + start:base + start + length].decode(encoding) for start, length in zip(starts.tolist(), lengths.tolist())]
+        if dfa.char_alphabet:
+            return np.fromiter(map(dfa.run, records), dtype=bool, count=len(records))
+        # token alphabets: split the records into symbols like batch.tokenize, an empty record is an empty sequence
+        codes, sequence_lengths = dfa.encode_sequences([record.split(delimiter) if record else [] for record in records])
+        return dfa.run_encoded(codes, sequence_lengths)
+    table, accept, _ = dfa._numpy_tables()
+    # the only copy of the window is its translation to symbol ids
+    codes = byte_lut[np.frombuffer(mm, dtype=np.uint8, count=size, offset=base)]
+    order = np.argsort(-lengths, kind="stable")
+    sorted_starts, sorted_lengths = starts[order], lengths[order]
+    max_length = int(sorted_lengths[0]) if len(order) else 0
+    # running[i] is the number of records longer than i
+    running = np.searchsorted(-sorted_lengths, -np.arange(max_length), side="left")
+    states = np.full(len(order), dfa.initial_id, dtype=table.dtype)
+    for i in range(max_length):
+        m = running[i]
+        states[:m] = table[states[:m], codes[sorted_starts[:m] + i]]
+    accepted = np.empty(len(order), dtype=bool)
+    accepted[order] = accept[states]
+    return accepted
+
+def _newline_windows(mm: mmap.mmap, window_size: int):
+    '''
+    Splits the mapped file into windows of whole newline-delimited records.
+    A window grows past window_size only when a single record does not fit in it.
+
+    Yields:
+    - tuple: The offset of the window, its size, and the start and length of each record relative to it.
+    '''
+    size, pos = len(mm), 0
+    while pos < size:
+        count = min(window_size, size - pos)
+        while True:
+            ends = np.flatnonzero(np.frombuffer(mm, dtype=np.uint8, count=count, offset=pos) == 10)
+            if len(ends) or pos + count == size:
+                break
+            count = min(count * 2, size - pos)
+        if pos + count == size and mm[size - 1] != 10:
+            # the last record has no trailing newline
+            ends = np.append(ends, count)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        yield pos, count, starts, ends - starts
+        pos += int(ends[-1]) + 1
+
+def _prefixed_windows(mm: mmap.mmap, window_size: int, prefix_format: str):
+    '''
+    Splits the mapped file into windows of whole length-prefixed records.
+
+    Yields:
+    - tuple: The offset of the window, its size, and the start and length of each record payload relative to it.
+    '''
+    prefix = struct.Struct(prefix_format)
+    size, pos = len(mm), 0
+    while pos < size:
+        base, starts, lengths = pos, [], []
+        while pos < size and (not starts or pos - base < window_size):
+            if pos + prefix.size > size:
+                raise ValueError(f"Error: truncated length prefix at offset {pos}")
+            (length,) = prefix.unpack_from(mm, pos)
+            if pos + prefix.size + length > size:
+                raise ValueError(f"Error: truncated record at offset {pos}")
+            starts.append(pos + prefix.size - base)
+            lengths.append(length)
+            pos += prefix.size + length
+        yield base, pos - base, np.array(starts, dtype=np.intp), np.array(lengths, dtype=np.intp)
+
+def scan_windows(dfa: DFA, file_path: str, framing: str = "newline", window_size: int = 1 << 22, prefix_format: str = "<I", encoding: str = "utf-8", delimiter: str = ","):
+    '''
+    Runs the DFA over the records of a file through mmap, one window of records at a time.
+    Memory use is bounded by the window size (or by the longest record), not by the size of the file.
+
+    Args:
+    - dfa (DFA): The DFA to run.
+    - file_path (str): The path of the file to scan.
+    - framing (str): "newline" for records separated by b"\\n", "prefixed" for records preceded by their length in bytes.
+    - window_size (int): The number of bytes processed at a time.
+    - prefix_format (str): The struct format of the length prefix, a little-endian 32 bit unsigned integer by default.
+    - encoding (str): The encoding of the records.
+    - delimiter (str): The string between two symbols of a record when the symbols of the DFA are not all single characters (e.g. built with DFA.join). If None, any whitespace.
+
+    Yields:
+    - tuple: An array with the file offset of each record of the window and a boolean array, True where the record is accepted.
+    '''
+    if framing not in ("newline", "prefixed"):
+        raise ValueError("Error: framing must be 'newline' or 'prefixed'")
+    byte_lut = _byte_tables(dfa, encoding)
+    with open(file_path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            windows = _newline_windows(mm, window_size) if framing == "newline" else _prefixed_windows(mm, window_size, prefix_format)
+            for base, size, starts, lengths in windows:
+                offsets = base + starts if framing == "newline" else base + starts - struct.calcsize(prefix_format)
+                yield offsets, _run_records(dfa, byte_lut, encoding, delimiter, mm, base, size, starts, lengths)
+
+def scan(dfa: DFA, file_path: str, framing: str = "newline", window_size: int = 1 << 22, prefix_format: str = "<I", encoding: str = "utf-8", delimiter: str = ","):
+    '''
+    Runs the DFA over the records of a file through mmap.
+
+    Args:
+    - see scan_windows.
+
+    Yields:
+    - tuple: The file offset of each record and True if the record is accepted, False otherwise.
+    '''
+    for offsets, accepted in scan_windows(dfa, file_path, framing, window_size, prefix_format, encoding, delimiter):
+        yield from zip(offsets.tolist(), accepted.tolist())
+
+def scan_to_file(dfa: DFA, file_path: str, output_path: str, framing: str = "newline", window_size: int = 1 << 22, prefix_format: str = "<I", encoding: str = "utf-8", delimiter: str = ",") -> tuple:
+    '''
+    Runs the DFA over the records of a file through mmap and writes one "offset<TAB>accepted" line per record to the output file.
+
+    Args:
+    - output_path (str): The path of the output file.
+    - see scan_windows for the other arguments.
+
+    Returns:
+    - tuple: The number of records and the number of accepted records.
+    '''
+    n_records = n_accepted = 0
+    with open(output_path, "w") as out:
+        for offsets, accepted in scan_windows(dfa, file_path, framing, window_size, prefix_format, encoding, delimiter):
+            out.write("".join([f"{offset}\t{flag}\n" for offset, flag in zip(offsets.tolist(), accepted.view(np.uint8).tolist())]))
+            n_records += len(accepted)
+            n_accepted += int(accepted.sum())
+    return n_records, n_accepted
+
+# Usage: python stream.py dfa.json corpus.txt [output.tsv]
+if __name__ == "__main__":
+    dfa_handler = DFA(sys.argv[1])
+    if len(sys.argv) > 3:
+        print(scan_to_file(dfa_handler, sys.argv[2], sys.argv[3]))
+    else:
+        for offset, accepted in scan(dfa_handler, sys.argv[2]):
+            print(offset, accepted)
@@ -0,0 +1,172 @@
+from collections import deque
+
+def _quote(text) -> str:
+    '''
+    Returns a text as a quoted DOT string.
+    '''
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def input_path(dfa, input_string) -> tuple:
+    '''
+    Follows an input string through a DFA.
+
+    Args:
+    - dfa (DFA): The DFA.
+    - input_string (str): The input string, or sequence of symbols.
+
+    Returns:
+    - tuple: The list of the state ids visited, starting with the initial state, and the symbol on which the run died (None if it did not).
+    '''
+    table, width, symbol_index, dead_state = dfa.table, len(dfa.symbols), dfa.symbol_index, dfa.dead_state
+    path = [dfa.initial_id]
+    for s in input_string:
+        symbol = symbol_index.get(s)
+        next_state = dead_state if symbol is None else table[path[-1] * width + symbol]
+        if next_state == dead_state:
+            return path, s
+        path.append(next_state)
+    return path, None
+
+def neighborhood(dfa, states, hops: int = 1, direction: str = "both") -> set:
+    '''
+    Returns the states within a number of transitions of some states.
+
+    Args:
+    - dfa (DFA): The DFA.
+    - states (iterable): The ids of the states at the center of the neighborhood.
+    - hops (int): The largest number of transitions from a center.
+    - direction (str): "out" to follow transitions forward, "in" backward, "both" in either direction.
+
+    Returns:
+    - set: The ids of the states in the neighborhood, the dead state excluded.
+    '''
+    if direction not in ("out", "in", "both"):
+        raise ValueError("Error: direction must be 'out', 'in' or 'both'")
+    table, width, dead_state = dfa.table, len(dfa.symbols), dfa.dead_state
+    predecessors = None
+    if direction != "out" and hops > 0:
+        # built once per compile, the following views of the same DFA only walk the neighborhood
+        if dfa._predecessors is None:
+            dfa._predecessors = [[] for _ in range(dead_state + 1)]
+            for i, to_state in enumerate(table):
+                if to_state != dead_state:
+                    dfa._predecessors[to_state].append(i // width)
+        predecessors = dfa._predecessors
+    seen = set(states)
+    queue = deque((state, 0) for state in seen)
+    while queue:
+        state, distance = queue.popleft()
+        if distance == hops:
+            continue
+        adjacent = []
+        if direction != "in":
+            adjacent.extend(table[state * width:(state + 1) * width])
+        if predecessors is not None:
+            adjacent.extend(predecessors[state])
+        for next_state in adjacent:
+            if next_state != dead_state and next_state not in seen:
+                seen.add(next_state)
+                queue.append((next_state, distance + 1))
+    return seen
+
+def to_dot(dfa, states=None, input_string=None, heat=None) -> str:
+    '''
+    Writes the DOT source of a DFA diagram straight from the transition table, in one pass over it.
+    Transitions between the same two states are merged into one edge labelled with all their symbols.
+
+    Args:
+    - dfa (DFA): The DFA.
+    - states (iterable): The ids of the states to draw, every state if None. Transitions leaving the drawn states are omitted.
+    - input_string (str): An input string whose path is highlighted.
+    - heat (Profile): Profiling counters overlaid on the diagram, states are shaded by visits and edges widened by hits, see DFA.profile.
+
+    Returns:
+    - str: The DOT source.
+    '''
+    table, width, symbols, names, dead_state = dfa.table, len(dfa.symbols), dfa.symbols, dfa.state_names, dfa.dead_state
+    states = range(dead_state) if states is None else sorted(states)
+    shown = set(states)
+    path_states, path_edges, died_on = set(), set(), None
+    if input_string is not None:
+        path, died_on = input_path(dfa, input_string)
+        path_states = set(path)
+        path_edges = set(zip(path, path[1:]))
+    if heat is not None:
+        max_visits = max(heat.state_visits[:dead_state], default=0) or 1
+        max_hits = max(heat.transition_hits, default=0) or 1
+
+    lines = ["digraph DFA {", "    rankdir=LR;", '    __start [shape=point, label=""];']
+    for state in states:
+        attributes = ["shape=doublecircle" if dfa.accept_bitmap[state] else "shape=circle", "style=filled", "fillcolor=grey" if state == dfa.initial_id else "fillcolor=white", f"label={_quote(names[state])}"]
+        if heat is not None:
+            # from white (never visited) to red (most visited), labelled with the visit count
+            attributes[2] = f'fillcolor="0.000 {heat.state_visits[state] / max_visits:.3f} 1.000"'
+            attributes[3] = f"label={_quote(str(names[state]) + f' ({heat.state_visits[state]})')}"
+        if state in path_states:
+            attributes.append("color=red, penwidth=2")
+        lines.append(f"    n{state} [{', '.join(attributes)}];")
+    if dfa.initial_id in shown:
+        lines.append(f"    __start -> n{dfa.initial_id};")
+    for state in states:
+        labels, hits = {}, {}
+        row = table[state * width:(state + 1) * width]
+        for symbol, to_state in enumerate(row):
+            if to_state != dead_state and to_state in shown:
+                labels.setdefault(to_state, []).append(str(symbols[symbol]))
+                if heat is not None:
+                    hits[to_state] = hits.get(to_state, 0) + heat.transition_hits[state * width + symbol]
+        for to_state, edge_symbols in labels.items():
+            label = ",".join(edge_symbols)
+            style = ", color=red, penwidth=2" if (state, to_state) in path_edges else ""
+            if heat is not None:
+                label += f" ({hits[to_state]})"
+                style = style or f", penwidth={1 + 4 * hits[to_state] / max_hits:.2f}"
+            lines.append(f"    n{state} -> n{to_state} [label={_quote(label)}{style}];")
+    if died_on is not None and path[-1] in shown:
+        # the run of the highlighted input died, the failing symbol leads nowhere
+        lines.append('    __reject [shape=plaintext, label="reject", fontcolor=red];')
+        lines.append(f"    n{path[-1]} -> __reject [label={_quote(died_on)}, color=red, style=dashed];")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def draw(dfa, file_name=None, format: str = "png", around=None, hops: int = 1, input_string=None, heat=None):
+    '''
+    Draws a diagram of a DFA. Optionally saves the diagram to a file.
+    The diagram may be restricted to the states around some state, or around the path of an input string, so that large automata stay readable.
+    Rendering to an image uses the graphviz package and the Graphviz binaries, writing "dot" only needs this module.
+
+    Args:
+    - dfa (DFA): The DFA to draw.
+    - file_name (str): The file path (without extension) to save the diagram. If None, the diagram will be displayed but not saved.
+    - format (str): The output format, "png", "svg" or "dot" for the DOT source.
+    - around (str): The name of a state, only the states within hops transitions of it (in either direction) are drawn.
+    - hops (int): The radius of the neighborhood drawn around a state or the highlighted path.
+    - input_string (str): An input string whose path is highlighted. With around unset, only the states within hops transitions of the path are drawn.
+    - heat (Profile): Profiling counters overlaid on the diagram, see to_dot.
+
+    Returns:
+    - str: The path of the written file, the DOT source for "dot" without file_name, None when the diagram is only displayed.
+    '''
+    if format not in ("png", "svg", "dot"):
+        raise ValueError("Error: format must be 'png', 'svg' or 'dot'")
+    centers = []
+    if around is not None:
+        if around not in dfa.state_index:
+            raise ValueError(f"Error: unknown state {around!r}")
+        centers.append(dfa.state_index[around])
+    elif input_string is not None:
+        centers.extend(input_path(dfa, input_string)[0])
+    states = neighborhood(dfa, centers, hops) if centers else None
+    dot = to_dot(dfa, states, input_string, heat)
+
+    if format == "dot":
+        if not file_name:
+            return dot
+        with open(file_name + ".dot", "w") as f:
+            f.write(dot)
+        return file_name + ".dot"
+    from graphviz import Source
+    source = Source(dot)
+    if file_name:
+        return source.render(file_name, format=format, cleanup=True)
+    source.view()